@@ -1,45 +1,206 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, Response, stream_with_context, g
 import os
+import gzip
+import hashlib
+import json
+import queue
+import threading
+import time
 from dotenv import load_dotenv
 
 # Load environment variables FIRST
 load_dotenv()
 
-from services.news_service import news_service
-from services.gemini_service import gemini_service
-from services.drive_service import drive_service
-from services.pdf_service import pdf_service
-from services.keyword_service import keyword_service
-import requests
-from bs4 import BeautifulSoup
+from services.startup_service import startup_service
+from services.metrics_service import metrics_service
+from services.cache_service import LRUCache
+
+# Services are cheap to import; network connections happen on first use.
+# Each import is timed for the startup report, in dependency order: a step
+# covers that module and the libraries only it uses, because modules used
+# by several services (and their libraries) were imported by an earlier step.
+with startup_service.timed("shared", "import"):
+    import services.http_service
+    import services.runtime_service
+    import services.scheduler_service
+with startup_service.timed("drive", "import"):
+    from services.drive_service import drive_service
+with startup_service.timed("gemini", "import"):
+    from services.gemini_service import gemini_service, ANALYSIS_PERSONAS
+with startup_service.timed("archive", "import"):
+    import services.news_archive_service
+with startup_service.timed("sentiment", "import"):
+    import services.sentiment_service
+with startup_service.timed("clustering", "import"):
+    import services.clustering_service
+with startup_service.timed("news", "import"):
+    from services.news_service import news_service
+with startup_service.timed("pdf", "import"):
+    from services.pdf_service import pdf_service
+with startup_service.timed("keywords", "import"):
+    from services.keyword_service import keyword_service
+with startup_service.timed("jobs", "import"):
+    from services.job_service import job_service
+with startup_service.timed("page", "import"):
+    from services.page_service import page_service
+with startup_service.timed("reports", "import"):
+    from services.report_service import report_service
 
 app = Flask(__name__)
 # Use a static secret key for production (from .env) or a default for dev
 app.secret_key = os.getenv("SECRET_KEY", "dev-key")
+# Static files (the report font) already carry ETag/Last-Modified; let clients keep them
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = int(os.getenv("STATIC_MAX_AGE", 7 * 86400))
+
+# Responses of at least this many bytes are gzipped when the client accepts it
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", 1024))
+COMPRESSIBLE_TYPES = ("text/html", "application/json", "text/css", "text/javascript", "application/javascript")
+
+# Rendered pages and JSON bodies, each stored with the data version it was
+# built from. Once the news or keyword data changes the version no longer
+# matches and the next request re-renders.
+rendered_cache = LRUCache(
+    max_entries=int(os.getenv("RENDERED_CACHE_MAX_ENTRIES", 200)),
+    max_bytes=int(os.getenv("RENDERED_CACHE_MAX_BYTES", 16 * 1024 * 1024)),
+    sizeof=lambda entry: len(entry[1]) + len(entry[3] or b"")
+) # {key: (version, body, etag, gzipped_body)}
+
+# Keep feeds for the user's keywords warm so page views never wait on RSS
+news_service.set_keyword_provider(keyword_service.get_keywords)
+
+print(startup_service.report())
+
+def warm_services():
+    """
+    Connects services in a background thread so the first request does not
+    pay for authentication and downloads. Call once per process after fork
+    (see gunicorn.conf.py).
+    """
+    def warm():
+        with startup_service.timed("warm", "total"):
+            drive_service.service
+            keyword_service.get_keywords()
+            gemini_service.model
+            news_service.start_refresher()
+            gemini_service.start_trending_refresher()
+        print(startup_service.report())
+
+    threading.Thread(target=warm, name="warm-services", daemon=True).start()
+
+# Request metrics. teardown_request runs after a streamed body is finished,
+# so SSE routes are timed end to end.
+@app.before_request
+def start_request_timer():
+    g.metrics_route = request.url_rule.rule if request.url_rule else "unmatched"
+    g.metrics_started = time.perf_counter()
+    metrics_service.request_started(g.metrics_route)
+
+@app.after_request
+def record_response_status(response):
+    g.metrics_status = response.status_code
+    return response
+
+@app.teardown_request
+def finish_request_timer(error=None):
+    if 'metrics_started' not in g:
+        return
+    metrics_service.request_finished(request.method, g.metrics_route,
+                                     g.get('metrics_status', 500),
+                                     time.perf_counter() - g.metrics_started)
+
+@app.after_request
+def compress_response(response):
+    # Streams (SSE), files and conditional responses pass through untouched
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    if not _accepts_gzip() or response.content_length is None or response.content_length < COMPRESS_MIN_BYTES:
+        return response
+    response.set_data(gzip.compress(response.get_data(), compresslevel=6))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+def _accepts_gzip():
+    return request.accept_encodings['gzip'] > 0
+
+def _cached_response(key, version, render, mimetype='text/html'):
+    """
+    Serves render() (a str) from rendered_cache while version is unchanged,
+    with a strong ETag and Cache-Control: no-cache, so a revalidation costs
+    a version and ETag comparison and answers 304 Not Modified.
+    """
+    entry = rendered_cache.get(key)
+    if entry is None or entry[0] != version:
+        metrics_service.cache_result("rendered", "miss")
+        body = render().encode('utf-8')
+        gzipped = gzip.compress(body, compresslevel=6) if len(body) >= COMPRESS_MIN_BYTES else None
+        entry = (version, body, hashlib.sha256(body).hexdigest()[:32], gzipped)
+        rendered_cache.set(key, entry)
+    else:
+        metrics_service.cache_result("rendered", "hit")
+
+    _, body, etag, gzipped = entry
+    response = Response(mimetype=mimetype)
+    if gzipped is not None and _accepts_gzip():
+        # Strong ETags identify exact bytes, so each encoding gets its own
+        response.set_data(gzipped)
+        response.headers['Content-Encoding'] = 'gzip'
+        etag += "-gzip"
+    else:
+        response.set_data(body)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    return response.make_conditional(request)
+
+@app.route('/metrics')
+def metrics():
+    return Response(metrics_service.render(), content_type=metrics_service.content_type)
 
 # Routes
 @app.route('/')
 def index():
     # Fetch news based on selected keyword or default
     keyword = request.args.get('keyword')
+    user_keywords, keywords_version = keyword_service.get_keywords(with_version=True)
     if keyword:
-        news_items = news_service.get_latest_news([keyword])
+        news_items, news_stale, news_version = news_service.get_latest_news([keyword], with_version=True)
         current_keyword = keyword
     else:
         # If no keyword selected, use all user keywords or default
-        user_keywords = keyword_service.get_keywords()
-        news_items = news_service.get_latest_news(user_keywords)
+        news_items, news_stale, news_version = news_service.get_latest_news(user_keywords, with_version=True)
         current_keyword = "전체"
 
-    return render_template('index.html', 
-                          news_items=news_items, 
-                          keywords=keyword_service.get_keywords(),
-                          current_keyword=current_keyword)
+    return _cached_response(
+        f"index:{keyword or ''}",
+        f"{keywords_version}:{news_version}:{int(news_stale)}",
+        lambda: render_template('index.html',
+                                news_items=news_items,
+                                news_stale=news_stale,
+                                keywords=user_keywords,
+                                current_keyword=current_keyword)
+    )
+
+@app.route('/api/news/search')
+def api_news_search():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'success': False, 'message': "Missing query"}), 400
+    days = request.args.get('days', type=int)
+    limit = max(1, min(request.args.get('limit', 50, type=int), 200))
+    return jsonify({'success': True, 'items': news_service.search(query, days=days, limit=limit)})
+
+@app.route('/api/startup')
+def api_startup():
+    return jsonify({'pid': os.getpid(), 'timings': startup_service.timings()})
 
 @app.route('/api/keywords', methods=['GET', 'POST', 'DELETE'])
 def manage_keywords():
     if request.method == 'GET':
-        return jsonify(keyword_service.get_keywords())
+        keywords, version = keyword_service.get_keywords(with_version=True)
+        return _cached_response("keywords", version, lambda: app.json.dumps(keywords),
+                                mimetype='application/json')
     
     data = request.json
     keyword = data.get('keyword')
@@ -52,45 +213,177 @@ def manage_keywords():
         keyword_service.remove_keyword(keyword)
         return jsonify({'success': True})
 
+def _sse(event, data):
+    """Formats one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _sse_response(events):
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/api/analyze_link', methods=['POST'])
 def analyze_link():
     data = request.json
     url = data.get('url')
     
     try:
-        # Simple scraping
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        response = requests.get(url, headers=headers)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Extract title and likely main content
-        title = soup.title.string if soup.title else "No Title"
-        # Heuristic: Find paragraphs
-        paragraphs = soup.find_all('p')
-        content = " ".join([p.get_text() for p in paragraphs])
-        
+        title, content = page_service.fetch_article(url)
         result = gemini_service.analyze_link_content(title, content)
         return jsonify({'success': True, 'result': result})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
+@app.route('/api/analyze_link/stream')
+def analyze_link_stream():
+    url = request.args.get('url')
+
+    def events():
+        try:
+            title, content = page_service.fetch_article(url)
+            for text in gemini_service.stream_link_content(title, content):
+                yield _sse('chunk', text)
+            yield _sse('done', {'success': True})
+        except Exception as e:
+            yield _sse('done', {'success': False, 'message': str(e)})
+
+    return _sse_response(events())
+
 @app.route('/analysis')
 def analysis():
     ticker = request.args.get('ticker', '005930') # Default to Samsung Electronics
     # In a real app, we would fetch analysis here or via AJAX
     return render_template('analysis.html', ticker=ticker)
 
+def _submit_analysis(ticker, persona):
+    # Identical in-flight (ticker, persona) requests share one generation.
+    # Cached analyses are answered here, not queued behind running research
+    key = gemini_service.analysis_key(ticker, persona)
+    cached = gemini_service.cached_analysis(ticker, persona)
+    if cached is not None:
+        return job_service.completed(key, cached)
+    return job_service.submit(key, gemini_service.analyze_stock, ticker, persona)
+
 @app.route('/api/analyze', methods=['POST'])
 def api_analyze():
     data = request.json
     ticker = data.get('ticker')
     persona = data.get('persona', 'neutral')
-    result = gemini_service.analyze_stock(ticker, persona)
-    return jsonify({'result': result})
+    job = job_service.wait(_submit_analysis(ticker, persona))
+    if job.status == 'error':
+        return jsonify({'result': f"Error generating analysis: {job.error}"})
+    return jsonify({'result': job.result})
+
+@app.route('/api/analyze/jobs', methods=['POST'])
+def api_analyze_submit():
+    data = request.json
+    ticker = data.get('ticker')
+    persona = data.get('persona', 'neutral')
+    if not ticker:
+        return jsonify({'success': False, 'message': "Missing ticker"}), 400
+
+    job = _submit_analysis(ticker, persona)
+    return jsonify(job.to_dict()), 202
+
+@app.route('/api/analyze/stream')
+def api_analyze_stream():
+    ticker = request.args.get('ticker')
+    persona = request.args.get('persona', 'neutral')
+    if not ticker:
+        return jsonify({'success': False, 'message': "Missing ticker"}), 400
+
+    # Runs as the shared (ticker, persona) job, so concurrent viewers and
+    # /api/analyze callers share one generation; chunks are relayed as published
+    key = gemini_service.analysis_key(ticker, persona)
+    cached = gemini_service.cached_analysis(ticker, persona)
+    if cached is not None:
+        job = job_service.completed(key, cached)
+    else:
+        job = job_service.submit_stream(key, gemini_service.stream_analyze_stock, ticker, persona)
+
+    def events():
+        streamed = False
+        for text in job.stream():
+            streamed = True
+            yield _sse('chunk', text)
+        if not streamed:
+            # Attached to a non-streaming job: send its result in one piece
+            yield _sse('chunk', _job_text(job))
+        yield _sse('done', {'success': True})
+
+    return _sse_response(events())
+
+def _job_text(job):
+    if job.status == 'error':
+        return f"Error generating analysis: {job.error}"
+    return job.result
+
+def _run_research_personas(ticker):
+    """
+    Starts the optimist and critic analyses concurrently (sharing any
+    in-flight jobs). Returns a queue that receives (persona, text) as each finishes.
+    """
+    finished = queue.Queue()
+    for persona in ('optimist', 'critic'):
+        _submit_analysis(ticker, persona).add_done_callback(
+            lambda job, persona=persona: finished.put((persona, _job_text(job)))
+        )
+    return finished
+
+@app.route('/api/analyze/all', methods=['POST'])
+def api_analyze_all():
+    """All three views: optimist and critic in parallel, then a neutral synthesis of the two."""
+    ticker = request.json.get('ticker')
+    if not ticker:
+        return jsonify({'success': False, 'message': "Missing ticker"}), 400
+
+    finished = _run_research_personas(ticker)
+    results = dict(finished.get() for _ in range(2))
+    results['neutral'] = gemini_service.synthesize_analysis(ticker, results['optimist'], results['critic'])
+    return jsonify({'results': results})
+
+@app.route('/api/analyze/all/stream')
+def api_analyze_all_stream():
+    """
+    Streaming variant of /api/analyze/all. Sends a 'persona' event for each
+    research view as it completes, then the neutral synthesis as 'chunk' events.
+    """
+    ticker = request.args.get('ticker')
+    if not ticker:
+        return jsonify({'success': False, 'message': "Missing ticker"}), 400
+
+    def events():
+        finished = _run_research_personas(ticker)
+        results = {}
+        for _ in range(2):
+            persona, text = finished.get()
+            results[persona] = text
+            yield _sse('persona', {'persona': persona, 'text': text})
+
+        for text in gemini_service.stream_synthesize_analysis(ticker, results['optimist'], results['critic']):
+            yield _sse('chunk', text)
+        yield _sse('done', {'success': True})
+
+    return _sse_response(events())
+
+@app.route('/api/jobs/<job_id>')
+def api_job_status(job_id):
+    job = job_service.get(job_id)
+    if not job:
+        return jsonify({'success': False, 'message': "Unknown or expired job"}), 404
+
+    # Long-poll: hold the request until the job finishes or `wait` seconds pass
+    wait = min(request.args.get('wait', 0, type=float), 30)
+    if wait > 0:
+        job_service.wait(job, wait)
+    return jsonify(job.to_dict())
 
 @app.route('/picks')
 def picks():
-    return render_template('picks.html')
+    # Static template: one render per process
+    return _cached_response("picks", None, lambda: render_template('picks.html'))
 
 @app.route('/api/recommend', methods=['POST'])
 def api_recommend():
@@ -99,6 +392,20 @@ def api_recommend():
     recommendations = gemini_service.recommend_stocks(theme)
     return jsonify({'recommendations': recommendations})
 
+@app.route('/api/recommend/stream')
+def api_recommend_stream():
+    theme = request.args.get('theme')
+
+    def events():
+        chunks = []
+        for text in gemini_service.stream_recommend_stocks(theme):
+            chunks.append(text)
+            yield _sse('chunk', text)
+        recommendations = gemini_service.parse_recommendations("".join(chunks))
+        yield _sse('done', {'recommendations': recommendations})
+
+    return _sse_response(events())
+
 @app.route('/api/save_pdf', methods=['POST'])
 def save_pdf():
     try:
@@ -109,21 +416,57 @@ def save_pdf():
         if not ticker or not content:
             return jsonify({'success': False, 'message': "Missing ticker or content"})
 
-        # Generate PDF
-        pdf_path = pdf_service.create_report(ticker, content)
-        
-        # Upload to Drive
-        link, error = drive_service.upload_file(pdf_path, f"{ticker}_report.pdf")
+        # Render and upload run in the report pipeline; wait for the link here
+        job = job_service.wait(report_service.submit_report(ticker, content))
         
-        if error:
-            return jsonify({'success': False, 'message': error})
+        if job.status == 'error':
+            return jsonify({'success': False, 'message': job.error})
         
-        return jsonify({'success': True, 'link': link})
+        return jsonify({'success': True, 'link': job.result['link']})
         
     except Exception as e:
         import traceback
         traceback.print_exc() # Print to server logs
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@app.route('/api/save_pdf/jobs', methods=['POST'])
+def save_pdf_submit():
+    data = request.json
+    ticker = data.get('ticker')
+    content = data.get('content')
+    if not ticker or not content:
+        return jsonify({'success': False, 'message': "Missing ticker or content"}), 400
+
+    job = report_service.submit_report(ticker, content)
+    return jsonify(job.to_dict()), 202
+
+@app.route('/api/reports/batch', methods=['POST'])
+def reports_batch():
+    """
+    Body: {"tickers": [...] or "ticker": "...", "personas": [...] or "all", "combined": bool}
+    """
+    data = request.json
+    tickers = data.get('tickers')
+    if tickers is None:
+        tickers = [data['ticker']] if data.get('ticker') is not None else []
+    if not isinstance(tickers, list) or not all(isinstance(t, str) and t.strip() for t in tickers):
+        return jsonify({'success': False, 'message': "tickers must be a list of non-empty strings"}), 400
+    tickers = list(dict.fromkeys(t.strip() for t in tickers))
+    personas = data.get('personas') or ['neutral']
+    if personas == 'all':
+        personas = list(ANALYSIS_PERSONAS)
+    if not isinstance(personas, list):
+        return jsonify({'success': False, 'message': "personas must be a list or \"all\""}), 400
+    personas = [p for p in personas if p in ANALYSIS_PERSONAS]
+
+    if not tickers or not personas:
+        return jsonify({'success': False, 'message': "Missing tickers or personas"}), 400
+    if len(tickers) * len(personas) > report_service.max_batch_items:
+        return jsonify({'success': False, 'message': f"Batch is limited to {report_service.max_batch_items} reports"}), 400
+
+    job = report_service.submit_batch(tickers, personas, combined=bool(data.get('combined')))
+    return jsonify(job.to_dict()), 202
+
 if __name__ == '__main__':
+    warm_services()
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,92 @@
+"""
+Offline benchmarks. Examples (from the repository root):
+
+    python -m bench load --requests 100 --concurrency 16 --output bench/results/run.json
+    python -m bench load --worker-class gevent --workers 1 --concurrency 200 --only analyze
+    python -m bench micro --iterations 50 --output bench/results/micro.json
+    python -m bench all --output bench/results/new.json
+    python -m bench compare bench/results/base.json bench/results/new.json --threshold 10
+
+`compare` exits with status 1 if any benchmark's p95 regressed by more than
+the threshold (percent), so it can gate CI.
+"""
+import argparse
+import sys
+import time
+
+from bench import results
+
+def _gemini_latency(args):
+    return {"gemini": args.flash_latency, "deep-research": args.research_latency}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Offline load tests and microbenchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(command):
+        command.add_argument("--output", default=f"bench/results/{time.strftime('%Y%m%d-%H%M%S')}.json",
+                             help="Where to write the JSON results")
+        command.add_argument("--flash-latency", type=float, default=0.3, help="Fake Gemini Flash seconds per call")
+        command.add_argument("--research-latency", type=float, default=1.5, help="Fake deep research seconds per call")
+
+    def add_load(command):
+        command.add_argument("--requests", type=int, default=50, help="Measured requests per endpoint")
+        command.add_argument("--concurrency", type=int, default=8)
+        command.add_argument("--warmup", type=int, default=5)
+        command.add_argument("--workers", type=int, default=2, help="gunicorn workers")
+        command.add_argument("--threads", type=int, default=16, help="gunicorn threads per worker")
+        command.add_argument("--worker-class", default="gthread", choices=["gthread", "gevent"])
+        command.add_argument("--stream-chunks", type=int, default=8)
+        command.add_argument("--feed-latency", type=float, default=0.05)
+        command.add_argument("--drive-latency", type=float, default=0.05)
+        command.add_argument("--warm", action="store_true",
+                             help="Repeat the same inputs so app caches hit (default: new inputs per request)")
+        command.add_argument("--only", nargs="*", help="Only endpoints whose name contains one of these")
+
+    def add_micro(command):
+        command.add_argument("--iterations", type=int, default=30)
+
+    add_load(commands.add_parser("load", help="Run the app under gunicorn and load each endpoint"))
+    add_micro(commands.add_parser("micro", help="In-process microbenchmarks"))
+    both = commands.add_parser("all", help="load + micro into one result file")
+    add_load(both)
+    add_micro(both)
+    for name in ("load", "micro", "all"):
+        add_common(commands.choices[name])
+
+    compare = commands.add_parser("compare", help="Compare two result files")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=10.0, help="Allowed slowdown in percent")
+    compare.add_argument("--metric", default="p95_ms")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        regressions = results.compare(args.baseline, args.current, args.threshold, args.metric)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            return 1
+        return 0
+
+    output = {"meta": results.metadata(vars(args))}
+    if args.command in ("load", "all"):
+        from bench import load
+        output["load"] = load.run(
+            requests_count=args.requests, concurrency=args.concurrency, warmup=args.warmup,
+            workers=args.workers, threads=args.threads, gemini_latency=_gemini_latency(args),
+            stream_chunks=args.stream_chunks, feed_latency=args.feed_latency,
+            drive_latency=args.drive_latency, cold=not args.warm, only=args.only,
+            worker_class=args.worker_class
+        )
+        results.print_table("Load (gunicorn)", output["load"])
+    if args.command in ("micro", "all"):
+        from bench import micro
+        output["micro"] = micro.run(iterations=args.iterations)
+        results.print_table("Microbenchmarks", output["micro"])
+
+    results.write(output, args.output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,366 @@
+"""
+Local stand-ins for the Google services the app talks to, so benchmarks run
+offline and with controlled latency:
+
+- FakeNewsServer: Google News RSS search plus article pages for link analysis
+- FakeGeminiServer: the Generative Language REST API (generateContent and
+  streamGenerateContent) with per-model latency and chunked streaming
+- FakeDriveServer: the Drive v3 endpoints DriveService uses (resumable
+  uploads, list, media download, update)
+
+Point the app at them with NEWS_RSS_BASE_URL, GEMINI_API_ENDPOINT and
+DRIVE_API_ENDPOINT (see fake_env).
+"""
+import email.utils
+import hashlib
+import itertools
+import json
+import os
+import re
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+def _fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status, body=b"", content_type="application/json", headers=None):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, data, status=200, headers=None):
+        self._send(status, json.dumps(data, ensure_ascii=False), headers=headers)
+
+class _Server:
+    handler = None
+
+    def __init__(self, host="127.0.0.1", port=0):
+        handler = type(self.handler.__name__, (self.handler,), {"fake": self})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.requests = 0
+        self._count_lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self):
+        with self._count_lock:
+            self.requests += 1
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, name=type(self).__name__, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+# --- News -------------------------------------------------------------------
+
+class _NewsHandler(_Handler):
+    def do_GET(self):
+        self.fake.count()
+        parts = urllib.parse.urlsplit(self.path)
+        if parts.path == "/rss/search":
+            return self._feed(urllib.parse.parse_qs(parts.query).get("q", [""])[0])
+        if parts.path.startswith("/articles/"):
+            time.sleep(self.fake.article_latency)
+            return self._send(200, self.fake.article(parts.path.rsplit("/", 1)[-1]),
+                              content_type="text/html; charset=utf-8")
+        self._send(404, b"{}")
+
+    def _feed(self, query):
+        time.sleep(self.fake.feed_latency)
+        body = self.fake.feed(query)
+        etag = '"%s"' % hashlib.md5(body.encode("utf-8")).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            return self._send(304, headers={"ETag": etag})
+        self._send(200, body, content_type="application/rss+xml; charset=utf-8", headers={"ETag": etag})
+
+class FakeNewsServer(_Server):
+    """
+    Serves the recorded feed in fixtures/google_news_rss.xml for every search,
+    with its dates moved up to now so it looks like a fresh "when:3d" result.
+    For keyword searches, titles without a requested keyword get one prefixed,
+    the way search results always mention the query.
+    """
+    handler = _NewsHandler
+
+    def __init__(self, feed_latency=0.05, article_latency=0.05, **kwargs):
+        super().__init__(**kwargs)
+        self.feed_latency = feed_latency
+        self.article_latency = article_latency
+        self._template = self._shift_dates(_fixture("google_news_rss.xml"))
+        self._article = _fixture("article.html")
+
+    @staticmethod
+    def _shift_dates(feed):
+        built = email.utils.parsedate_to_datetime(re.search(r"<lastBuildDate>(.*?)</lastBuildDate>", feed).group(1))
+        offset = email.utils.parsedate_to_datetime(email.utils.formatdate(usegmt=True)) - built
+
+        def shift(match):
+            moved = email.utils.parsedate_to_datetime(match.group(2)) + offset
+            return f"<{match.group(1)}>{email.utils.format_datetime(moved, usegmt=True)}</{match.group(1)}>"
+
+        return re.sub(r"<(pubDate|lastBuildDate)>(.*?)</\1>", shift, feed)
+
+    def feed(self, query):
+        keywords = re.findall(r'"([^"]+)"', query)
+        if not keywords:
+            return self._template
+        cycle = itertools.cycle(keywords)
+
+        def title(match):
+            text = match.group(1)
+            if any(k in text for k in keywords):
+                return match.group(0)
+            return f"<title>[{next(cycle)}] {text}</title>"
+
+        channel, items = self._template.split("<item>", 1)
+        return channel + "<item>" + re.sub(r"<title>(.*?)</title>", title, items)
+
+    def article(self, article_id):
+        # The id goes into the text so every article hashes differently
+        return self._article.replace("</article>", f"<p>기사 번호 {article_id}</p>\n</article>")
+
+# --- Gemini -----------------------------------------------------------------
+
+class _GeminiHandler(_Handler):
+    def do_POST(self):
+        self.fake.count()
+        match = re.match(r"^/v1beta/models/([^:/]+):(generateContent|streamGenerateContent)", self.path)
+        if not match:
+            return self._send(404, b"{}")
+        model, method = match.groups()
+        request = json.loads(self._body() or b"{}")
+        text = self.fake.respond(model, request)
+        latency = self.fake.latency_for(model)
+
+        if method == "generateContent":
+            time.sleep(latency)
+            return self._send_json(self.fake.response(text))
+
+        # Streamed responses are a JSON array whose elements arrive over time
+        chunks = self.fake.split(text)
+        time.sleep(latency / 2) # Time to first token
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        interval = (latency / 2) / max(len(chunks), 1)
+        for index, chunk in enumerate(chunks):
+            prefix = "[" if index == 0 else ","
+            suffix = "]" if index == len(chunks) - 1 else ""
+            last = index == len(chunks) - 1
+            self._write_chunk(prefix + json.dumps(self.fake.response(chunk, last), ensure_ascii=False) + suffix)
+            time.sleep(interval)
+        self._write_chunk("")
+
+    def _write_chunk(self, data):
+        data = data.encode("utf-8")
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+class FakeGeminiServer(_Server):
+    """
+    Answers like Gemini: plain text for prompts, schema-shaped JSON for
+    recommendation and headline-scoring requests. `latency` maps a model
+    name prefix to seconds per call; streams spread it over `stream_chunks`.
+    """
+    handler = _GeminiHandler
+
+    def __init__(self, latency=None, stream_chunks=8, text_length=1500, **kwargs):
+        super().__init__(**kwargs)
+        self.latency = latency or {"gemini": 0.3, "deep-research": 1.5}
+        self.stream_chunks = stream_chunks
+        self.text_length = text_length
+
+    def latency_for(self, model):
+        for prefix, seconds in self.latency.items():
+            if model.startswith(prefix):
+                return seconds
+        return 0.3
+
+    def respond(self, model, request):
+        prompt = "".join(part.get("text", "")
+                         for content in request.get("contents", [])
+                         for part in content.get("parts", []))
+        config = request.get("generationConfig", {})
+        if config.get("responseMimeType") == "application/json":
+            if config.get("responseSchema"):
+                return json.dumps(self._recommendations(prompt), ensure_ascii=False)
+            return json.dumps(self._headline_scores(prompt), ensure_ascii=False)
+        return self._report(model, prompt)
+
+    def _report(self, model, prompt):
+        seed = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        sentence = f"[{model}/{seed}] 이 분석은 벤치마크용 가짜 응답입니다. 실적, 수급, 밸류에이션을 차례로 검토합니다. "
+        return (sentence * (self.text_length // len(sentence) + 1))[:self.text_length]
+
+    def _recommendations(self, prompt):
+        return [
+            {"name": f"벤치 종목 {i}", "ticker": f"00{i}930", "reason": "가짜 추천 사유",
+             "valuation": "PER 12배", "risk": "업황 둔화"}
+            for i in range(3)
+        ]
+
+    def _headline_scores(self, prompt):
+        count = len(re.findall(r"^\s*\d+\. ", prompt, flags=re.MULTILINE))
+        sentiments = ("positive", "negative", "neutral")
+        return [{"index": i, "sentiment": sentiments[i % 3], "impact": "가짜 영향 요약"} for i in range(count)]
+
+    def split(self, text):
+        size = max(1, -(-len(text) // self.stream_chunks))
+        return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+    def response(self, text, last=True):
+        candidate = {"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}
+        if last:
+            candidate["finishReason"] = "STOP"
+        return {"candidates": [candidate]}
+
+# --- Drive ------------------------------------------------------------------
+
+class _DriveHandler(_Handler):
+    def do_POST(self):
+        self.fake.count()
+        parts = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(parts.query)
+        body = self._body()
+        if parts.path == "/upload/drive/v3/files" and query.get("uploadType") == ["resumable"]:
+            upload_id = self.fake.start_upload(json.loads(body or b"{}"))
+            return self._send(200, headers={"Location": f"{self.fake.url}/upload/drive/v3/files?upload_id={upload_id}"})
+        self._send(404, b"{}")
+
+    def do_PUT(self):
+        self.fake.count()
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        upload_id = query.get("upload_id", [None])[0]
+        body = self._body()
+        time.sleep(self.fake.latency)
+        result = self.fake.receive_chunk(upload_id, body, self.headers.get("Content-Range"))
+        if result is None:
+            return self._send(404, b"{}")
+        if isinstance(result, int):
+            # More chunks expected
+            return self._send(308, headers={"Range": f"bytes=0-{result - 1}"})
+        self._send_json(result)
+
+    def do_GET(self):
+        self.fake.count()
+        parts = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(parts.query)
+        time.sleep(self.fake.latency)
+        if parts.path == "/drive/v3/files":
+            return self._send_json({"files": self.fake.search(query.get("q", [""])[0])})
+        match = re.match(r"^/drive/v3/files/([^/]+)$", parts.path)
+        if match and query.get("alt") == ["media"]:
+            content = self.fake.files.get(match.group(1), {}).get("content")
+            if content is None:
+                return self._send(404, b"{}")
+            return self._send(200, content, content_type="application/octet-stream")
+        self._send(404, b"{}")
+
+    def do_PATCH(self):
+        self.fake.count()
+        parts = urllib.parse.urlsplit(self.path)
+        body = self._body()
+        match = re.match(r"^/upload/drive/v3/files/([^/]+)$", parts.path)
+        if match and match.group(1) in self.fake.files:
+            upload_id = self.fake.start_upload({}, file_id=match.group(1))
+            return self._send(200, headers={"Location": f"{self.fake.url}/upload/drive/v3/files?upload_id={upload_id}"})
+        self._send(404, b"{}")
+
+class FakeDriveServer(_Server):
+    """In-memory Drive: resumable uploads (single or multi-chunk), name search, download, update."""
+    handler = _DriveHandler
+
+    def __init__(self, latency=0.05, **kwargs):
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.files = {} # {file_id: {"name", "content"}}
+        self._uploads = {} # {upload_id: {"metadata", "file_id", "data"}}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def start_upload(self, metadata, file_id=None):
+        with self._lock:
+            upload_id = f"u{next(self._ids)}"
+            self._uploads[upload_id] = {"metadata": metadata, "file_id": file_id, "data": bytearray()}
+            return upload_id
+
+    def receive_chunk(self, upload_id, data, content_range):
+        with self._lock:
+            upload = self._uploads.get(upload_id)
+            if upload is None:
+                return None
+            upload["data"].extend(data)
+            # "bytes 0-999/1000"; "*" as the total means the size is not known yet
+            total = (content_range or "").rsplit("/", 1)[-1]
+            if total == "*" or (total.isdigit() and len(upload["data"]) < int(total)):
+                return len(upload["data"])
+
+            del self._uploads[upload_id]
+            file_id = upload["file_id"] or f"fake{next(self._ids)}"
+            entry = self.files.setdefault(file_id, {"name": upload["metadata"].get("name", file_id)})
+            entry["content"] = bytes(upload["data"])
+            return {"id": file_id, "name": entry["name"],
+                    "webViewLink": f"{self.url}/file/d/{file_id}/view"}
+
+    def search(self, query):
+        match = re.search(r"name = '([^']*)'", query)
+        with self._lock:
+            return [{"id": file_id, "name": entry["name"]} for file_id, entry in self.files.items()
+                    if not match or entry["name"] == match.group(1)]
+
+# --- Wiring -----------------------------------------------------------------
+
+def start_fakes(gemini_latency=None, stream_chunks=8, feed_latency=0.05, drive_latency=0.05):
+    """Starts all three stand-ins. Returns {"news", "gemini", "drive"}."""
+    return {
+        "news": FakeNewsServer(feed_latency=feed_latency).start(),
+        "gemini": FakeGeminiServer(latency=gemini_latency, stream_chunks=stream_chunks).start(),
+        "drive": FakeDriveServer(latency=drive_latency).start()
+    }
+
+def fake_env(fakes, cache_dir):
+    """Environment that points the app at the stand-ins, with scheduler limits lifted."""
+    return {
+        "NEWS_RSS_BASE_URL": f"{fakes['news'].url}/rss/search",
+        "GEMINI_API_ENDPOINT": fakes["gemini"].url,
+        "GOOGLE_API_KEY": "benchmark",
+        "DRIVE_API_ENDPOINT": fakes["drive"].url,
+        "GOOGLE_DRIVE_FOLDER_ID": "",
+        "CACHE_DIR": cache_dir,
+        "PROMETHEUS_MULTIPROC_DIR": os.path.join(cache_dir, "prometheus"),
+        # Measure the app, not our own quota protection
+        "GEMINI_FLASH_RPM": "0",
+        "GEMINI_RESEARCH_RPM": "0",
+        "GEMINI_FLASH_CONCURRENCY": "64",
+        "GEMINI_RESEARCH_CONCURRENCY": "64",
+        "TRENDING_REFRESH_INTERVAL": "0"
+    }
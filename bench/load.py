@@ -0,0 +1,148 @@
+"""
+Load driver: runs the real app under gunicorn against the local stand-ins
+and measures latency and throughput per endpoint.
+"""
+import itertools
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from bench import results
+from bench.fakes import fake_env, start_fakes
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+REPORT_TEXT = ("벤치마크 보고서 본문입니다. 실적, 수급, 밸류에이션과 위험 요인을 정리합니다. " * 60).strip()
+
+def scenarios(article_base_url, cold):
+    """
+    (name, method, path, payload factory) for each endpoint. With cold=True
+    every request uses new inputs, so analysis/link/recommendation/report
+    caches miss and the dependencies are exercised; otherwise inputs repeat.
+    """
+    counter = itertools.count()
+
+    def n():
+        return next(counter) if cold else 0
+
+    def report():
+        i = n()
+        return {"ticker": f"BENCH{i}", "content": f"{REPORT_TEXT} #{i}"}
+
+    return [
+        ("GET /", "GET", "/", lambda: None),
+        ("POST /api/analyze", "POST", "/api/analyze",
+         lambda: {"ticker": f"BENCH{n()}", "persona": "neutral"}),
+        ("POST /api/analyze_link", "POST", "/api/analyze_link",
+         lambda: {"url": f"{article_base_url}/articles/{n()}"}),
+        ("POST /api/recommend", "POST", "/api/recommend",
+         lambda: {"theme": f"벤치 테마 {n()}"}),
+        ("POST /api/save_pdf", "POST", "/api/save_pdf", report)
+    ]
+
+class AppServer:
+    """The app under gunicorn (using gunicorn.conf.py) on a free local port."""
+    def __init__(self, env, workers, threads, port, worker_class="gthread"):
+        self.url = f"http://127.0.0.1:{port}"
+        self.log = tempfile.NamedTemporaryFile(prefix="bench-gunicorn-", suffix=".log", delete=False)
+        command = [sys.executable, "-m", "gunicorn", "app:app", "-c", "gunicorn.conf.py",
+                   "--workers", str(workers), "--threads", str(threads), "--worker-class", worker_class,
+                   "--bind", f"127.0.0.1:{port}", "--timeout", "300"]
+        self.process = subprocess.Popen(command, cwd=ROOT_DIR, env={**os.environ, **env},
+                                        stdout=self.log, stderr=subprocess.STDOUT)
+
+    def wait_ready(self, timeout=60):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"gunicorn exited early; see {self.log.name}")
+            try:
+                if requests.get(f"{self.url}/api/startup", timeout=1).ok:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError(f"gunicorn did not become ready; see {self.log.name}")
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+def succeeded(response):
+    """HTTP success that is not an application-level failure reported in the body."""
+    if not response.ok:
+        return False
+    if not response.headers.get("Content-Type", "").startswith("application/json"):
+        return True
+    data = response.json()
+    if not isinstance(data, dict):
+        return True
+    return data.get("success") is not False and not str(data.get("result", "")).startswith("Error")
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def run_scenario(base_url, method, path, payload, requests_count, concurrency, warmup):
+    session_local = threading.local()
+
+    def session():
+        if not hasattr(session_local, "session"):
+            session_local.session = requests.Session()
+        return session_local.session
+
+    def one():
+        started = time.perf_counter()
+        try:
+            response = session().request(method, base_url + path, json=payload(), timeout=300)
+            ok = succeeded(response)
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - started, ok
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda _: one(), range(warmup)))
+        started = time.perf_counter()
+        outcomes = list(pool.map(lambda _: one(), range(requests_count)))
+        elapsed = time.perf_counter() - started
+
+    latencies = [latency for latency, _ in outcomes]
+    errors = sum(1 for _, ok in outcomes if not ok)
+    return results.summarize(latencies, elapsed, errors)
+
+def run(requests_count=50, concurrency=8, warmup=5, workers=2, threads=16, port=None,
+        gemini_latency=None, stream_chunks=8, feed_latency=0.05, drive_latency=0.05,
+        cold=True, only=None, worker_class="gthread"):
+    """Returns {scenario name: summary}."""
+    fakes = start_fakes(gemini_latency, stream_chunks, feed_latency, drive_latency)
+    cache_dir = tempfile.mkdtemp(prefix="bench-cache-")
+    env = fake_env(fakes, cache_dir)
+    env["WARM_SERVICES"] = "1"
+
+    server = AppServer(env, workers, threads, port or free_port(), worker_class)
+    try:
+        server.wait_ready()
+        measured = {}
+        for name, method, path, payload in scenarios(fakes["news"].url, cold):
+            if only and not any(part in name for part in only):
+                continue
+            print(f"[Bench] {name}: {requests_count} requests, concurrency {concurrency}")
+            measured[name] = run_scenario(server.url, method, path, payload,
+                                          requests_count, concurrency, warmup)
+        print(f"[Bench] Calls to stand-ins: { {name: fake.requests for name, fake in fakes.items()} }")
+        return measured
+    finally:
+        server.stop()
+        for fake in fakes.values():
+            fake.stop()
@@ -0,0 +1,84 @@
+"""
+In-process microbenchmarks for NewsService.get_latest_news and
+PDFService.create_report, with feeds and headline scoring served by the
+local stand-ins.
+"""
+import os
+import tempfile
+import time
+
+from bench import results
+from bench.fakes import fake_env, start_fakes
+from bench.load import REPORT_TEXT
+
+def _time(fn, iterations):
+    latencies = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - started)
+    return results.summarize(latencies)
+
+def _fresh_news_service(archive_path):
+    """
+    A NewsService with nothing to reuse: its own empty cache, a new archive
+    (so no archived view or stored scores) and no memoized scores or title
+    sketches, which are otherwise shared between instances.
+    """
+    from services.cache_service import LRUCache
+    from services.clustering_service import clustering_service
+    from services.news_archive_service import news_archive_service
+    from services.news_service import NewsService
+    from services.sentiment_service import sentiment_service
+
+    news_archive_service.path = archive_path
+    news_archive_service._ready_pid = None
+    sentiment_service._memo = LRUCache(max_entries=sentiment_service._memo.max_entries)
+    clustering_service._memo = LRUCache(max_entries=clustering_service._memo.max_entries)
+    return NewsService()
+
+def _close(news_service):
+    # Waits for the background scoring a cold fetch schedules
+    if news_service._executor:
+        news_service._executor.shutdown(wait=True)
+
+def run(iterations=30, feed_latency=0.0, gemini_latency=None):
+    """Returns {benchmark name: summary}."""
+    fakes = start_fakes(gemini_latency or {"gemini": 0.0, "deep-research": 0.0}, feed_latency=feed_latency)
+    cache_dir = tempfile.mkdtemp(prefix="bench-micro-")
+    os.environ.update(fake_env(fakes, cache_dir))
+    os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None) # Single process
+
+    # Imported only now so the services pick up the stand-in endpoints
+    from services.pdf_service import pdf_service
+
+    keywords = ["반도체", "2차전지", "AI", "삼성전자"]
+    measured = {}
+    try:
+        # Cold: nothing cached or archived per call, so every feed is fetched and parsed
+        latencies = []
+        for i in range(iterations):
+            cold = _fresh_news_service(os.path.join(cache_dir, f"news_archive_cold_{i}.sqlite3"))
+            started = time.perf_counter()
+            cold.get_latest_news(keywords)
+            latencies.append(time.perf_counter() - started)
+            _close(cold)
+        measured["news.get_latest_news cold"] = results.summarize(latencies)
+
+        # Warm: primed by one fetch into the feed cache (not served from the archive)
+        warm = _fresh_news_service(os.path.join(cache_dir, "news_archive_warm.sqlite3"))
+        warm.get_latest_news(keywords)
+        measured["news.get_latest_news warm"] = _time(
+            lambda: warm.get_latest_news(keywords), iterations)
+        _close(warm)
+
+        output_path = os.path.join(cache_dir, "bench_report.pdf")
+        started = time.perf_counter()
+        pdf_service.create_report("BENCH", REPORT_TEXT, output_path=output_path)
+        measured["pdf.create_report first"] = results.summarize([time.perf_counter() - started])
+        measured["pdf.create_report"] = _time(
+            lambda: pdf_service.create_report("BENCH", REPORT_TEXT, output_path=output_path), iterations)
+        return measured
+    finally:
+        for fake in fakes.values():
+            fake.stop()
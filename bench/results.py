@@ -0,0 +1,87 @@
+"""Latency statistics, JSON result files, and run-to-run comparison."""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+def summarize(latencies, elapsed=None, errors=0):
+    """Latencies in seconds -> milliseconds summary (plus throughput when elapsed is given)."""
+    if not latencies:
+        return {"requests": 0, "errors": errors}
+    summary = {
+        "requests": len(latencies),
+        "errors": errors,
+        "mean_ms": round(1000 * sum(latencies) / len(latencies), 2),
+        "p50_ms": round(1000 * percentile(latencies, 50), 2),
+        "p95_ms": round(1000 * percentile(latencies, 95), 2),
+        "p99_ms": round(1000 * percentile(latencies, 99), 2),
+        "max_ms": round(1000 * max(latencies), 2)
+    }
+    if elapsed:
+        summary["throughput_rps"] = round(len(latencies) / elapsed, 2)
+    return summary
+
+def metadata(settings):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "settings": settings
+    }
+
+def write(results, path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"[Bench] Results written to {path}")
+
+def print_table(section, rows):
+    print(f"\n{section}")
+    print(f"  {'name':<28}{'n':>6}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rps':>9}")
+    for name, row in rows.items():
+        print(f"  {name:<28}{row.get('requests', 0):>6}{row.get('errors', 0):>5}"
+              f"{row.get('p50_ms', '-'):>10}{row.get('p95_ms', '-'):>10}{row.get('p99_ms', '-'):>10}"
+              f"{row.get('throughput_rps', '-'):>9}")
+
+def compare(baseline_path, current_path, threshold=10.0, metric="p95_ms"):
+    """
+    Prints per-benchmark change in `metric` between two result files and
+    returns the names that got slower by more than threshold percent.
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(current_path, encoding="utf-8") as f:
+        current = json.load(f)
+
+    regressions = []
+    print(f"{'benchmark':<36}{'baseline':>12}{'current':>12}{'change':>10}")
+    for section in ("load", "micro"):
+        for name, row in current.get(section, {}).items():
+            before = baseline.get(section, {}).get(name, {}).get(metric)
+            after = row.get(metric)
+            if before is None or after is None:
+                continue
+            change = 100.0 * (after - before) / before if before else 0.0
+            flag = ""
+            if change > threshold:
+                regressions.append(f"{section}/{name}")
+                flag = "  REGRESSION"
+            print(f"{section + '/' + name:<36}{before:>12.2f}{after:>12.2f}{change:>9.1f}%{flag}")
+    return regressions
@@ -0,0 +1,43 @@
+import os
+import shutil
+import uuid
+
+# Workers write Prometheus metrics to files here so /metrics can sum them.
+# Must be set before the app (and prometheus_client) is imported.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(os.getenv("CACHE_DIR", "cache"), "prometheus"))
+
+# Shared by the workers so job_service can tell jobs left in flight by an
+# earlier run (whose process ids may be reused) from live ones
+os.environ.setdefault("JOB_RUN_ID", uuid.uuid4().hex)
+
+# Imported up front: child_exit runs from a signal handler, where a first
+# import can collide with one already in progress
+from prometheus_client import multiprocess
+
+# Workers follow gunicorn's default (WEB_CONCURRENCY); jobs are shared
+# between them through job_service's SQLite store
+threads = int(os.getenv("GUNICORN_THREADS", 16))
+
+# "gthread" (default): a thread per in-flight request, --threads per worker.
+# "gevent": outbound waits (feeds, pages, Gemini, Drive, SSE streams) yield
+# to other requests, so one worker holds up to worker_connections of them.
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", 1000))
+
+def on_starting(server):
+    # Values left over from a previous run would be summed in
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+# Services connect lazily on first use. Warm them in the background in each
+# worker once it is initialized (after gevent has patched, when in use), which
+# is also safe when the app is loaded with --preload.
+def post_worker_init(worker):
+    if os.getenv("WARM_SERVICES", "1") == "1":
+        from app import warm_services
+        warm_services()
+
+def child_exit(server, worker):
+    # Drop the exited worker's live gauges (e.g. in-flight requests)
+    multiprocess.mark_process_dead(worker.pid)
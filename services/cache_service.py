@@ -0,0 +1,158 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+
+from services.metrics_service import metrics_service
+
+CACHE_DIR = os.getenv("CACHE_DIR", "cache")
+
+class DiskCache:
+    """
+    SQLite-backed key/value cache shared by every gunicorn worker.
+    Entries expire after `ttl` seconds and, once `max_entries` is exceeded,
+    the least recently used ones are evicted. Values must be JSON-serializable.
+    """
+    def __init__(self, name, ttl, max_entries):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0 # Per-process counters
+        self.misses = 0
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        self.path = os.path.join(CACHE_DIR, f"{name}.sqlite3")
+
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON entries(accessed_at)")
+
+    def _connect(self):
+        # A connection per operation keeps this safe across threads and forks.
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+    def get(self, key):
+        now = time.time()
+        try:
+            with closing(self._connect()) as conn:
+                row = conn.execute(
+                    "SELECT value, created_at FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    self._count(hit=False)
+                    return None
+                value, created_at = row
+                if now - created_at >= self.ttl:
+                    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    self._count(hit=False)
+                    return None
+                conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+                self._count(hit=True)
+                return json.loads(value)
+        except sqlite3.Error as e:
+            print(f"[Cache] Read error ({self.path}): {e}")
+            self._count(hit=False)
+            return None
+
+    def _count(self, hit):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        metrics_service.cache_result(self.name, "hit" if hit else "miss")
+
+    def set(self, key, value):
+        now = time.time()
+        try:
+            with closing(self._connect()) as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), now, now)
+                )
+                self._evict(conn, now)
+        except sqlite3.Error as e:
+            print(f"[Cache] Write error ({self.path}): {e}")
+
+    def delete(self, key):
+        try:
+            with closing(self._connect()) as conn:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        except sqlite3.Error as e:
+            print(f"[Cache] Delete error ({self.path}): {e}")
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM entries WHERE created_at <= ?", (now - self.ttl,))
+        conn.execute(
+            "DELETE FROM entries WHERE key IN ("
+            " SELECT key FROM entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+def approx_size(value):
+    """Rough in-memory footprint of JSON-like data, in bytes."""
+    if isinstance(value, str):
+        return 49 + len(value.encode('utf-8'))
+    if isinstance(value, dict):
+        return 64 + sum(approx_size(k) + approx_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return 56 + sum(approx_size(v) for v in value)
+    return 28
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU bounded by entry count and approximate size.
+    """
+    def __init__(self, max_entries, max_bytes=None, sizeof=approx_size):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._data = OrderedDict() # {key: (size, value)}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def peek(self, key, default=None):
+        """Like get, but does not count as a use."""
+        with self._lock:
+            entry = self._data.get(key)
+            return default if entry is None else entry[1]
+
+    def set(self, key, value):
+        size = self._sizeof(value) if self.max_bytes else 0
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old:
+                self._bytes -= old[0]
+            self._data[key] = (size, value)
+            self._bytes += size
+            while self._data and (len(self._data) > self.max_entries or
+                                  (self.max_bytes and self._bytes > self.max_bytes)):
+                _, (evicted_size, _) = self._data.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is None:
+                return default
+            self._bytes -= entry[0]
+            return entry[1]
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,131 @@
+import os
+import random
+import re
+import zlib
+
+from services.cache_service import LRUCache
+
+_MASK_64 = (1 << 64) - 1
+_SOURCE_SUFFIX = re.compile(r"\s+-\s+([^-]+)$") # "... - 한국경제"
+_TAGS = re.compile(r"\[[^\]]*\]|\([^)]*\)|【[^】]*】") # [단독], (종합), ...
+_NON_WORD = re.compile(r"\W+")
+
+class ClusteringService:
+    """
+    Groups headlines that report the same story under slightly different
+    titles. Titles are normalized (outlet suffix, [tags] and punctuation
+    removed), split into character 3-gram shingles and MinHashed; LSH
+    banding proposes candidate pairs, which are kept if their exact shingle
+    Jaccard similarity reaches the threshold. Cost is linear in the number
+    of items plus the (few) candidate pairs.
+    """
+    def __init__(self):
+        self.threshold = float(os.getenv("NEWS_CLUSTER_THRESHOLD", 0.5))
+        self.shingle_size = 3
+        # 16 bands x 2 rows: a pair at Jaccard 0.5 becomes a candidate with
+        # probability 0.99, unrelated titles (~0.05) in about 4% of pairs
+        self.bands = 16
+        self.rows = 2
+        # Multiply-shift hash functions (odd multiplier), fixed so every
+        # worker clusters identically
+        rng = random.Random(1)
+        self._hash_functions = [(rng.getrandbits(64) | 1, rng.getrandbits(64))
+                                for _ in range(self.bands * self.rows)]
+        # Feeds repeat the same titles refresh after refresh, and merged
+        # views are re-clustered per request, so keep the expensive part
+        self._memo = LRUCache(max_entries=int(os.getenv("NEWS_CLUSTER_MEMO_MAX_ENTRIES", 5000)))
+
+    def cluster(self, items):
+        """
+        Returns one representative per story, in input order: the first item
+        of each cluster (a copy), with the others under 'alternates' as
+        {'title', 'link', 'source'}. Alternates already attached to an input
+        item are carried over, so merged lists can be clustered again.
+        """
+        if len(items) < 2:
+            return [self._with_alternates(item, []) for item in items]
+
+        sketches = [self._sketch(item["title"]) for item in items]
+        shingles = [shingle_set for shingle_set, _ in sketches]
+        parent = list(range(len(items)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        buckets = {}
+        for i, (shingle_set, signature) in enumerate(sketches):
+            for band in range(self.bands):
+                key = (band, tuple(signature[band * self.rows:(band + 1) * self.rows]))
+                for j in buckets.setdefault(key, []):
+                    if find(i) != find(j) and self._jaccard(shingle_set, shingles[j]) >= self.threshold:
+                        # The earlier item stays the representative
+                        parent[find(i)] = find(j)
+                buckets[key].append(i)
+
+        groups = {}
+        for i in range(len(items)):
+            groups.setdefault(find(i), []).append(i)
+
+        representatives = []
+        # Members are in input order, so ordering groups by their first
+        # member keeps the output in input order whichever item is the root
+        for members in sorted(groups.values(), key=lambda members: members[0]):
+            alternates = []
+            for i in members[1:]:
+                alternates.append(self._alternate(items[i]))
+                alternates.extend(items[i].get("alternates", []))
+            representatives.append(self._with_alternates(items[members[0]], alternates))
+        return representatives
+
+    def normalize(self, title):
+        title = _SOURCE_SUFFIX.sub("", title)
+        title = _TAGS.sub(" ", title)
+        return _NON_WORD.sub("", title).lower()
+
+    def source_of(self, title):
+        match = _SOURCE_SUFFIX.search(title)
+        return match.group(1).strip() if match else None
+
+    def _sketch(self, title):
+        """(shingle set, MinHash signature) of a title."""
+        sketch = self._memo.get(title)
+        if sketch is None:
+            shingle_set = self._shingles(title)
+            sketch = (shingle_set, self._signature(shingle_set))
+            self._memo.set(title, sketch)
+        return sketch
+
+    def _shingles(self, title):
+        text = self.normalize(title)
+        if len(text) <= self.shingle_size:
+            return frozenset([text])
+        return frozenset(text[i:i + self.shingle_size] for i in range(len(text) - self.shingle_size + 1))
+
+    def _signature(self, shingle_set):
+        # crc32 instead of hash(): str hashes are salted per process
+        hashes = [zlib.crc32(shingle.encode('utf-8')) for shingle in shingle_set]
+        return tuple(min([(a * h + b) & _MASK_64 for h in hashes]) >> 32 for a, b in self._hash_functions)
+
+    @staticmethod
+    def _jaccard(a, b):
+        return len(a & b) / len(a | b) if a or b else 1.0
+
+    def _alternate(self, item):
+        return {"title": item["title"], "link": item["link"], "source": self.source_of(item["title"])}
+
+    @staticmethod
+    def _with_alternates(item, alternates):
+        item = dict(item)
+        seen = {item["link"]}
+        merged = []
+        for alternate in item.get("alternates", []) + alternates:
+            if alternate["link"] not in seen:
+                seen.add(alternate["link"])
+                merged.append(alternate)
+        item["alternates"] = merged
+        return item
+
+clustering_service = ClusteringService()
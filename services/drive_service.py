@@ -1,20 +1,65 @@
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest, MediaFileUpload, MediaIoBaseUpload, MediaIoBaseDownload
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import InstalledAppFlow
+from google.auth.credentials import AnonymousCredentials
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
+import atexit
+import httplib2
+import json
 import os
+import sys
+import tempfile
+import threading
+import time
+
+from services.metrics_service import metrics_service
+from services.startup_service import startup_service
+
+# Resumable chunks must be a multiple of 256 KB
+CHUNK_ALIGNMENT = 256 * 1024
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
 
 class DriveService:
+    """
+    Google Drive client. Authentication happens lazily on first use of
+    `service`, once per process, so importing this module costs nothing and
+    forked workers never share a parent's HTTP connections.
+    """
     def __init__(self):
         self.scopes = ['https://www.googleapis.com/auth/drive.file']
         self.creds = None
-        self.service = None
+        self._service = None
+        self._service_pid = None
+        self._lock = threading.Lock()
+        self._local = threading.local() # Per-thread HTTP connection
         self.folder_id = os.getenv("GOOGLE_DRIVE_FOLDER_ID")
-        
-        self.authenticate()
+        self._file_ids = {} # {filename: remote file id} for upload_json
+        # Transfers stream chunk by chunk, so peak memory is one chunk
+        chunk_size = int(os.getenv("DRIVE_CHUNK_SIZE", 4 * 1024 * 1024))
+        self.chunk_size = max(CHUNK_ALIGNMENT, -(-chunk_size // CHUNK_ALIGNMENT) * CHUNK_ALIGNMENT)
+        self.max_retries = int(os.getenv("DRIVE_MAX_RETRIES", 5))
+
+    @property
+    def service(self):
+        if self._service_pid != os.getpid():
+            with self._lock:
+                if self._service_pid != os.getpid():
+                    with startup_service.timed("drive", "init"):
+                        self._service = None
+                        self.authenticate()
+                    self._service_pid = os.getpid()
+        return self._service
 
     def authenticate(self):
+        endpoint = os.getenv("DRIVE_API_ENDPOINT")
+        if endpoint:
+            self._service = self._build_for_endpoint(endpoint)
+            return
+
         try:
             # [Cloud Fix] If token.json is missing but env var exists, create it
             env_token = os.getenv("GOOGLE_TOKEN_JSON")
@@ -33,6 +78,10 @@ class DriveService:
                     self.creds.refresh(Request())
                 else:
                     if os.path.exists('client_secret.json'):
+                        if not (sys.stdin and sys.stdin.isatty()):
+                            # A browser login would block a server worker indefinitely
+                            print("Warning: Drive token missing or expired and no terminal for OAuth login. Drive uploads disabled.")
+                            return
                         flow = InstalledAppFlow.from_client_secrets_file(
                             'client_secret.json', self.scopes)
                         self.creds = flow.run_local_server(port=0)
@@ -44,15 +93,80 @@ class DriveService:
                 with open('token.json', 'w') as token:
                     token.write(self.creds.to_json())
 
-            self.service = build('drive', 'v3', credentials=self.creds)
+            self._service = build('drive', 'v3', credentials=self.creds,
+                                  requestBuilder=self._build_request)
             print("[Drive] Authenticated successfully via OAuth.")
             
         except Exception as e:
             print(f"Error initializing Drive service (OAuth): {e}")
 
-    def upload_file(self, file_path, file_name):
+    def _build_for_endpoint(self, endpoint):
+        """
+        Client for a Drive API stand-in (e.g. the benchmark fake) without OAuth.
+        The bundled discovery document is rebased so uploads go there too.
+        """
+        doc = json.loads(discovery_cache.get_static_doc('drive', 'v3'))
+        doc['rootUrl'] = endpoint.rstrip('/') + '/'
+        print(f"[Drive] Using Drive API endpoint {doc['rootUrl']}")
+        self.creds = AnonymousCredentials()
+        return build_from_document(doc, credentials=self.creds, requestBuilder=self._build_request)
+
+    def _build_request(self, http, *args, **kwargs):
+        # httplib2 is not thread-safe, and uploads/syncs run on several threads,
+        # so each request uses its own thread's connection instead of the shared one
+        return HttpRequest(self._thread_http(), *args, **kwargs)
+
+    def _thread_http(self):
+        if getattr(self._local, 'pid', None) != os.getpid():
+            self._local.http = AuthorizedHttp(self.creds, http=httplib2.Http())
+            self._local.pid = os.getpid()
+        return self._local.http
+
+    def _media(self, source, mimetype=None):
+        """Resumable, chunked upload body from a local path or a binary file-like object."""
+        if isinstance(source, (str, os.PathLike)):
+            return MediaFileUpload(source, mimetype=mimetype, chunksize=self.chunk_size, resumable=True)
+        return MediaIoBaseUpload(source, mimetype=mimetype or 'application/octet-stream',
+                                 chunksize=self.chunk_size, resumable=True)
+
+    def _execute_resumable(self, request):
+        """
+        Sends a resumable upload chunk by chunk. After a transient failure the
+        client asks Drive how much it already has and continues from there,
+        so an interrupted upload does not start over.
+        """
+        response = None
+        failures = 0
+        while response is None:
+            try:
+                _, response = request.next_chunk()
+                failures = 0
+            except (HttpError, OSError) as e:
+                status = getattr(getattr(e, 'resp', None), 'status', None)
+                if isinstance(e, HttpError) and status not in RETRYABLE_STATUSES:
+                    raise
+                failures += 1
+                if failures > self.max_retries:
+                    raise
+                delay = min(2 ** failures, 60)
+                print(f"[Drive] Upload interrupted ({e}), resuming in {delay}s")
+                time.sleep(delay)
+        return response
+
+    def upload_file(self, source, file_name, mimetype='application/pdf'):
         """
         Uploads a file to Google Drive.
+        `source` is a local path or a binary file-like object (e.g. io.BytesIO).
+        """
+        file, error = self.create_file(source, file_name, mimetype)
+        if error:
+            return None, error
+        return file.get('webViewLink'), None
+
+    def create_file(self, source, file_name, mimetype='application/pdf'):
+        """
+        Like upload_file, but returns (file, error) where file is the Drive
+        resource with 'id' and 'webViewLink'.
         """
         if not self.service:
             return None, "Drive service not initialized."
@@ -62,15 +176,13 @@ class DriveService:
             if self.folder_id:
                 file_metadata['parents'] = [self.folder_id]
 
-            media = MediaFileUpload(file_path, mimetype='application/pdf')
-            
-            file = self.service.files().create(
+            request = self.service.files().create(
                 body=file_metadata,
-                media_body=media,
+                media_body=self._media(source, mimetype),
                 fields='id, webViewLink'
-            ).execute()
-            
-            return file.get('webViewLink'), None
+            )
+            with metrics_service.timed("drive", "create"):
+                return self._execute_resumable(request), None
         except Exception as e:
             return None, str(e)
 
@@ -82,7 +194,8 @@ class DriveService:
             if self.folder_id:
                 query += f" and '{self.folder_id}' in parents"
             
-            results = self.service.files().list(q=query, fields="files(id, name)").execute()
+            with metrics_service.timed("drive", "search"):
+                results = self.service.files().list(q=query, fields="files(id, name)").execute()
             files = results.get('files', [])
             if files:
                 return files[0]['id'] # Return first match
@@ -91,35 +204,50 @@ class DriveService:
             print(f"Drive Search Error: {e}")
             return None
 
-    def download_file(self, file_id, local_path):
-        """Download file content to local path."""
+    def download_file(self, file_id, destination):
+        """
+        Download file content, streaming chunk by chunk.
+        `destination` is a local path or a writable binary file-like object.
+        A local path is only replaced once the download has completed.
+        """
         if not self.service: return False
         try:
-            from googleapiclient.http import MediaIoBaseDownload
-            import io
             request = self.service.files().get_media(fileId=file_id)
-            fh = io.BytesIO()
-            downloader = MediaIoBaseDownload(fh, request)
-            done = False
-            while done is False:
-                status, done = downloader.next_chunk()
-            
-            with open(local_path, 'wb') as f:
-                f.write(fh.getvalue())
+            if not isinstance(destination, (str, os.PathLike)):
+                self._download_to(request, destination)
+                return True
+
+            directory = os.path.dirname(os.path.abspath(destination))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".download")
+            try:
+                with os.fdopen(fd, 'wb') as fh:
+                    self._download_to(request, fh)
+                os.replace(tmp_path, destination)
+            except:
+                os.remove(tmp_path)
+                raise
             return True
         except Exception as e:
             print(f"Drive Download Error: {e}")
             return False
 
-    def update_file(self, file_id, local_path):
-        """Update existing file content."""
+    def _download_to(self, request, fh):
+        downloader = MediaIoBaseDownload(fh, request, chunksize=self.chunk_size)
+        done = False
+        with metrics_service.timed("drive", "download"):
+            while done is False:
+                status, done = downloader.next_chunk(num_retries=self.max_retries)
+
+    def update_file(self, file_id, source, mimetype=None):
+        """Update existing file content from a local path or file-like object."""
         if not self.service: return False
         try:
-            media = MediaFileUpload(local_path, resumable=True)
-            self.service.files().update(
+            request = self.service.files().update(
                 fileId=file_id,
-                media_body=media
-            ).execute()
+                media_body=self._media(source, mimetype)
+            )
+            with metrics_service.timed("drive", "update"):
+                self._execute_resumable(request)
             return True
         except Exception as e:
             print(f"Drive Update Error: {e}")
@@ -127,20 +255,105 @@ class DriveService:
             
     def upload_json(self, local_path, filename):
         """Helper to upload/update JSON config file."""
-        existing_id = self.search_file(filename)
+        if not self.service: return False
+        # The remote ID is remembered after the first lookup to skip the search
+        existing_id = self._file_ids.get(filename) or self.search_file(filename)
         if existing_id:
-            return self.update_file(existing_id, local_path)
+            if self.update_file(existing_id, local_path):
+                self._file_ids[filename] = existing_id
+                return True
+            # The file may have been deleted remotely; search again next time
+            self._file_ids.pop(filename, None)
+            return False
         else:
             # Upload new
             try:
                 file_metadata = {'name': filename}
                 if self.folder_id:
                     file_metadata['parents'] = [self.folder_id]
-                media = MediaFileUpload(local_path, mimetype='application/json')
-                self.service.files().create(body=file_metadata, media_body=media).execute()
+                request = self.service.files().create(
+                    body=file_metadata,
+                    media_body=self._media(local_path, 'application/json'),
+                    fields='id'
+                )
+                with metrics_service.timed("drive", "create"):
+                    file = self._execute_resumable(request)
+                self._file_ids[filename] = file.get('id')
                 return True
             except Exception as e:
                 print(f"Drive Upload JSON Error: {e}")
                 return False
 
+class DriveSyncer:
+    """
+    Write-behind upload of one local file to Drive.
+    mark_dirty() returns immediately; bursts of edits are coalesced into a
+    single upload after `debounce` seconds. Failed uploads are retried with
+    exponential backoff, and pending changes are flushed at interpreter exit.
+    """
+    def __init__(self, drive, local_path, filename, debounce=2.0, max_backoff=300):
+        self.drive = drive
+        self.local_path = local_path
+        self.filename = filename
+        self.debounce = debounce
+        self.max_backoff = max_backoff
+        self._dirty = False
+        self._failures = 0
+        self._timer = None
+        self._lock = threading.Lock()
+        self._upload_lock = threading.Lock() # One upload at a time
+        atexit.register(self.flush)
+
+    def mark_dirty(self):
+        with self._lock:
+            self._dirty = True
+            self._schedule(self.debounce)
+
+    def flush(self):
+        """Uploads pending changes now (used at shutdown)."""
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+        self._sync()
+
+    def _schedule(self, delay):
+        # Caller holds self._lock. Restarting the timer debounces the burst.
+        if self._timer:
+            self._timer.cancel()
+        self._timer = threading.Timer(delay, self._sync)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _sync(self):
+        with self._upload_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                self._dirty = False
+                self._timer = None
+
+            if not self.drive.service:
+                return # Drive uploads disabled
+
+            try:
+                success = self.drive.upload_json(self.local_path, self.filename)
+            except Exception as e:
+                print(f"[Drive] Sync error for {self.filename}: {e}")
+                success = False
+
+            with self._lock:
+                if success:
+                    self._failures = 0
+                    print(f"[Drive] Synced {self.filename}")
+                    return
+
+                self._dirty = True
+                self._failures += 1
+                delay = min(self.debounce * (2 ** self._failures), self.max_backoff)
+                print(f"[Drive] Sync of {self.filename} failed, retrying in {delay:.0f}s")
+                # Newer edits may already have scheduled an upload
+                if not self._timer:
+                    self._schedule(delay)
+
 drive_service = DriveService()
@@ -1,48 +1,390 @@
 import os
 import google.generativeai as genai
+import hashlib
 import json
+import threading
+import time
+from dataclasses import dataclass, asdict
+
+from services.cache_service import DiskCache
+from services.metrics_service import metrics_service
+from services.runtime_service import runtime_service
+from services.scheduler_service import scheduler_service, PRIORITY_INTERACTIVE, PRIORITY_BATCH
+from services.startup_service import startup_service
+
+FLASH_MODEL_NAME = 'gemini-2.5-flash'
+RESEARCH_MODEL_NAME = 'deep-research-pro-preview-12-2025'
+
+# Bump when the analysis prompts change so stale cached reports are not served.
+ANALYSIS_PROMPT_VERSION = 1
+ANALYSIS_PERSONAS = ('optimist', 'critic', 'neutral')
+LINK_PROMPT_VERSION = 1
+SYNTHESIS_PROMPT_VERSION = 1
+RECOMMEND_PROMPT_VERSION = 1
+
+# Response schema for recommendations (JSON mode, OpenAPI subset)
+RECOMMENDATION_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "name": {"type": "STRING"},
+            "ticker": {"type": "STRING"},
+            "reason": {"type": "STRING"},
+            "valuation": {"type": "STRING"},
+            "risk": {"type": "STRING"}
+        },
+        "required": ["name", "ticker", "reason", "valuation", "risk"]
+    }
+}
+
+@dataclass(frozen=True)
+class Recommendation:
+    name: str
+    ticker: str
+    reason: str
+    valuation: str = ""
+    risk: str = ""
+
+    @classmethod
+    def from_dict(cls, data):
+        """Validates one model-produced record. Raises ValueError if unusable."""
+        if not isinstance(data, dict):
+            raise ValueError("Recommendation is not an object")
+        values = {field: str(data.get(field) or "").strip() for field in cls.__dataclass_fields__}
+        if not values["name"] or not values["ticker"]:
+            raise ValueError("Recommendation is missing name or ticker")
+        return cls(**values)
+
+    def to_dict(self):
+        return asdict(self)
 
 class GeminiService:
     def __init__(self):
-        api_key = os.getenv("GOOGLE_API_KEY")
-        if api_key:
-            genai.configure(api_key=api_key)
-            # Standard model for quick tasks
-            self.model = genai.GenerativeModel('gemini-2.5-flash')
-            # Deep Research model for heavy analysis
-            self.research_model = genai.GenerativeModel('deep-research-pro-preview-12-2025')
-        else:
-            self.model = None
-            self.research_model = None
+        # Shared across workers: one deep-research call per (ticker, persona) per TTL
+        self.analysis_cache = DiskCache(
+            "analysis",
+            ttl=int(os.getenv("ANALYSIS_CACHE_TTL", 86400)), # 1 day
+            max_entries=int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", 500))
+        )
+        # Flash answers given when deep research was skipped or failed. Kept
+        # briefly and apart from research results, so research takes over
+        # again once it recovers
+        self.fallback_cache = DiskCache(
+            "analysis_fallback",
+            ttl=int(os.getenv("ANALYSIS_FALLBACK_TTL", 600)),
+            max_entries=int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", 500))
+        )
+        # Link analyses keyed by a hash of the extracted article, not its URL
+        self.link_cache = DiskCache(
+            "link_analysis",
+            ttl=int(os.getenv("LINK_CACHE_TTL", 86400)),
+            max_entries=int(os.getenv("LINK_CACHE_MAX_ENTRIES", 2000))
+        )
+
+        # Every call goes through the scheduler: rate limits, priorities, and
+        # a circuit breaker that sends analyses straight to Flash while the
+        # research model is failing (e.g. quota exhausted)
+        scheduler_service.configure(FLASH_MODEL_NAME, "GEMINI_FLASH", rpm=60, burst=10, max_concurrent=8)
+        scheduler_service.configure(RESEARCH_MODEL_NAME, "GEMINI_RESEARCH", rpm=5, burst=2, max_concurrent=2,
+                                    breaker=True)
+        # How long an interactive analysis waits for a research slot before using Flash
+        self.research_wait = float(os.getenv("GEMINI_RESEARCH_WAIT", 5))
+        self.scoring_wait = float(os.getenv("GEMINI_SCORING_WAIT", 5))
+
+        # Recommendations keyed by normalized theme; "" is the trending list,
+        # which a background thread regenerates every trending_refresh_interval
+        self.recommend_cache = DiskCache(
+            "recommendations",
+            ttl=int(os.getenv("RECOMMEND_CACHE_TTL", 3600)),
+            max_entries=int(os.getenv("RECOMMEND_CACHE_MAX_ENTRIES", 500))
+        )
+        self.trending_refresh_interval = int(os.getenv("TRENDING_REFRESH_INTERVAL", 1800))
+        self._trending_refresher_pid = None
+
+        self._api_key = os.getenv("GOOGLE_API_KEY")
+        # Alternative API host (e.g. the benchmark fake), spoken to over REST
+        self._api_endpoint = os.getenv("GEMINI_API_ENDPOINT")
+        if not self._api_key:
             print("Warning: GOOGLE_API_KEY not found.")
+        # Models are configured on first use in each process (fork-safe)
+        self._models = (None, None)
+        self._models_pid = None
+        self._lock = threading.Lock()
 
-    def analyze_stock(self, ticker, persona):
-        """
-        Analyzes a stock using Deep Research model.
-        """
-        if not self.research_model:
-            return f"{persona} Analysis: API Key missing."
+    @property
+    def model(self):
+        # Standard model for quick tasks
+        return self._get_models()[0]
+
+    @property
+    def research_model(self):
+        # Deep Research model for heavy analysis
+        return self._get_models()[1]
 
+    def _get_models(self):
+        if self._models_pid != os.getpid():
+            with self._lock:
+                if self._models_pid != os.getpid():
+                    with startup_service.timed("gemini", "init"):
+                        if self._api_key:
+                            # gRPC blocks a gevent worker's event loop; REST over
+                            # patched sockets yields to other requests instead
+                            options = {}
+                            if self._api_endpoint or runtime_service.cooperative:
+                                options["transport"] = "rest"
+                            if self._api_endpoint:
+                                options["client_options"] = {"api_endpoint": self._api_endpoint}
+                            genai.configure(api_key=self._api_key, **options)
+                            self._models = (genai.GenerativeModel(FLASH_MODEL_NAME),
+                                            genai.GenerativeModel(RESEARCH_MODEL_NAME))
+                    self._models_pid = os.getpid()
+        return self._models
+
+    def analysis_key(self, ticker, persona, model_name=RESEARCH_MODEL_NAME):
+        """Normalized identity of an analysis, used for caching and job dedup."""
+        normalized_ticker = " ".join(str(ticker or "").split()).upper()
+        if persona not in ANALYSIS_PERSONAS:
+            persona = 'neutral'
+        return f"{normalized_ticker}|{persona}|{model_name}|v{ANALYSIS_PROMPT_VERSION}"
+
+    def cached_analysis(self, ticker, persona):
+        """A cached research result, else a recent Flash fallback, else None."""
+        cache_key = self.analysis_key(ticker, persona)
+        cached = self.analysis_cache.get(cache_key)
+        if cached is None:
+            cache_key = self.analysis_key(ticker, persona, FLASH_MODEL_NAME)
+            cached = self.fallback_cache.get(cache_key)
+        if cached is not None:
+            print(f"[Gemini] Serving cached analysis for: {cache_key}")
+        return cached
+
+    def _analysis_prompt(self, ticker, persona):
         prompts = {
             "optimist": f"Conduct a deep research on {ticker} as an optimistic analyst. Focus on growth potential, market opportunities, and competitive advantages. Provide a detailed report. (Korean)",
             "critic": f"Conduct a deep research on {ticker} as a critical analyst. Focus on financial risks, market threats, and valuation concerns. Provide a detailed report. (Korean)",
             "neutral": f"Conduct a deep research on {ticker} as a neutral reviewer. Synthesize optimistic and critical views into a balanced investment thesis. (Korean)"
         }
-        
-        prompt = prompts.get(persona, prompts['neutral'])
-        
+        return prompts.get(persona, prompts['neutral'])
+
+    def _get_model(self, model_name):
+        return self.research_model if model_name == RESEARCH_MODEL_NAME else self.model
+
+    def _generate(self, model_name, prompt, priority=PRIORITY_INTERACTIVE, timeout=None, **kwargs):
+        """One scheduled generate_content call. Returns the response text."""
+        with scheduler_service.slot(model_name, priority, timeout):
+            with metrics_service.timed("gemini", model_name):
+                return self._get_model(model_name).generate_content(prompt, **kwargs).text
+
+    def _stream_text(self, model_name, prompt, priority=PRIORITY_INTERACTIVE, timeout=None, **kwargs):
+        """Yields text chunks as the model generates them. Holds one scheduler slot for the stream."""
+        with scheduler_service.slot(model_name, priority, timeout), \
+                metrics_service.timed("gemini", f"{model_name}:stream"):
+            response = self._get_model(model_name).generate_content(prompt, stream=True, **kwargs)
+            for chunk in response:
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunk without text parts (e.g. safety metadata only)
+                    continue
+                if text:
+                    yield text
+
+    def _research_timeout(self, priority):
+        # Batch work can queue for research quota; interactive callers fall back sooner
+        return self.research_wait if priority == PRIORITY_INTERACTIVE else None
+
+    def analyze_stock(self, ticker, persona, priority=PRIORITY_INTERACTIVE):
+        """
+        Analyzes a stock using Deep Research model.
+        Results are served from the shared analysis cache when available.
+        """
+        if not self.research_model:
+            return f"{persona} Analysis: API Key missing."
+
+        prompt = self._analysis_prompt(ticker, persona)
+        cached = self.cached_analysis(ticker, persona)
+        if cached is not None:
+            return cached
+
         try:
             # Use research model for analysis
-            response = self.research_model.generate_content(prompt)
-            return response.text
+            result = self._generate(RESEARCH_MODEL_NAME, prompt, priority, self._research_timeout(priority))
         except Exception as e:
-            # Fallback to standard model if research model fails (e.g. quota)
+            # Fallback to standard model if research model fails or is skipped (e.g. quota)
             try:
                 print(f"Deep Research model failed: {e}. Falling back to Flash.")
-                response = self.model.generate_content(prompt)
-                return response.text
+                result = self._generate(FLASH_MODEL_NAME, prompt, priority)
             except Exception as e2:
+                # Errors are not cached so the next request retries
                 return f"Error generating analysis: {str(e2)}"
+            self.fallback_cache.set(self.analysis_key(ticker, persona, FLASH_MODEL_NAME), result)
+            return result
+
+        self.analysis_cache.set(self.analysis_key(ticker, persona), result)
+        return result
+
+    def stream_analyze_stock(self, ticker, persona, priority=PRIORITY_INTERACTIVE):
+        """
+        Streaming variant of analyze_stock. Yields text chunks as they arrive.
+        The completed text is written to the analysis cache.
+        """
+        if not self.research_model:
+            yield f"{persona} Analysis: API Key missing."
+            return
+
+        prompt = self._analysis_prompt(ticker, persona)
+        cached = self.cached_analysis(ticker, persona)
+        if cached is not None:
+            yield cached
+            return
+
+        chunks = []
+        cache, cache_key = self.analysis_cache, self.analysis_key(ticker, persona)
+        try:
+            for text in self._stream_text(RESEARCH_MODEL_NAME, prompt, priority, self._research_timeout(priority)):
+                chunks.append(text)
+                yield text
+        except Exception as e:
+            if chunks:
+                # Part of the report is already on the client, don't restart it
+                yield f"\n\nError generating analysis: {str(e)}"
+                return
+            try:
+                print(f"Deep Research model failed: {e}. Falling back to Flash.")
+                cache, cache_key = self.fallback_cache, self.analysis_key(ticker, persona, FLASH_MODEL_NAME)
+                for text in self._stream_text(FLASH_MODEL_NAME, prompt, priority):
+                    chunks.append(text)
+                    yield text
+            except Exception as e2:
+                yield f"Error generating analysis: {str(e2)}"
+                return
+
+        cache.set(cache_key, "".join(chunks))
+
+    def is_error(self, text):
+        """
+        True for the error strings analyze_stock returns instead of raising,
+        and for streamed reports cut short by an error.
+        """
+        return (not text or text.startswith("Error generating analysis") or text.endswith("API Key missing.")
+                or "\n\nError generating analysis: " in text)
+
+    def _synthesis_prompt(self, ticker, optimist, critic):
+        return f"""
+        You are a neutral reviewer. Below are an optimistic and a critical research report on {ticker}.
+        Synthesize them into a balanced investment thesis: weigh the strongest arguments on each side,
+        point out where they conflict, and conclude with key points to watch. Do not repeat the reports. (Korean)
+
+        [Optimistic report]
+        {optimist}
+
+        [Critical report]
+        {critic}
+        """
+
+    def _synthesis_cache_key(self, ticker, optimist, critic):
+        # Keyed by the inputs, so a new optimist/critic report yields a new synthesis
+        payload = json.dumps([SYNTHESIS_PROMPT_VERSION, FLASH_MODEL_NAME, self.analysis_key(ticker, 'neutral'),
+                              optimist, critic], ensure_ascii=False)
+        return "synthesis|" + hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def stream_synthesize_analysis(self, ticker, optimist, critic, priority=PRIORITY_INTERACTIVE):
+        """
+        Builds the neutral view from finished optimist and critic reports with
+        one Flash call instead of a third deep-research run. Yields text chunks.
+        Falls back to a full neutral analysis if neither input is usable.
+        """
+        optimist = None if self.is_error(optimist) else optimist
+        critic = None if self.is_error(critic) else critic
+        if not optimist and not critic:
+            yield from self.stream_analyze_stock(ticker, 'neutral', priority)
+            return
+
+        cache_key = self._synthesis_cache_key(ticker, optimist, critic)
+        cached = self.analysis_cache.get(cache_key)
+        if cached is not None:
+            print(f"[Gemini] Serving cached synthesis for: {ticker}")
+            yield cached
+            return
+
+        prompt = self._synthesis_prompt(ticker, optimist or "(unavailable)", critic or "(unavailable)")
+        chunks = []
+        try:
+            for text in self._stream_text(FLASH_MODEL_NAME, prompt, priority):
+                chunks.append(text)
+                yield text
+        except Exception as e:
+            # Keep any partial synthesis already sent, then report the error
+            prefix = "\n\n" if chunks else ""
+            yield f"{prefix}Error generating analysis: {str(e)}"
+            return
+
+        self.analysis_cache.set(cache_key, "".join(chunks))
+
+    def synthesize_analysis(self, ticker, optimist, critic, priority=PRIORITY_INTERACTIVE):
+        """Non-streaming variant of stream_synthesize_analysis."""
+        return "".join(self.stream_synthesize_analysis(ticker, optimist, critic, priority))
+
+    def _recommend_prompt(self, theme):
+        if not theme or theme.strip() == "":
+            return "Recommend 3 trending stocks based on recent major news, high search volume, and government policy announcements. Provide detailed reasons explaining why it is trending. Return JSON with name, ticker, reason, valuation, risk. (Translate all content to Korean)"
+        return f"Recommend 3 stocks related to '{theme}'. Provide detailed reasons for the recommendation. Return JSON with name, ticker, reason, valuation, risk. (Translate all content to Korean)"
+
+    def normalize_theme(self, theme):
+        """Cache identity of a theme: whitespace-collapsed and case-folded; "" means trending."""
+        return " ".join(str(theme or "").split()).casefold()
+
+    def _recommend_cache_key(self, theme):
+        return f"{self.normalize_theme(theme)}|{FLASH_MODEL_NAME}|v{RECOMMEND_PROMPT_VERSION}"
+
+    def parse_recommendations(self, text):
+        """
+        Parses model output into validated records (as dicts).
+        JSON mode should always give a clean array; the bracket slice is only a
+        fallback. Invalid items are dropped individually instead of failing the lot.
+        """
+        try:
+            data = json.loads(text)
+        except (TypeError, ValueError):
+            start = (text or "").find('[')
+            end = (text or "").rfind(']') + 1
+            try:
+                data = json.loads(text[start:end]) if start != -1 and end > start else []
+            except ValueError:
+                print("[Gemini] Could not parse recommendations.")
+                return []
+
+        recommendations = []
+        for item in data if isinstance(data, list) else []:
+            try:
+                recommendations.append(Recommendation.from_dict(item).to_dict())
+            except ValueError as e:
+                print(f"[Gemini] Dropping invalid recommendation: {e}")
+        return recommendations
+
+    def _recommend_config(self):
+        return {"response_mime_type": "application/json", "response_schema": RECOMMENDATION_SCHEMA}
+
+    def _cached_recommendations(self, theme):
+        entry = self.recommend_cache.get(self._recommend_cache_key(theme))
+        if entry is not None:
+            print(f"[Gemini] Serving cached recommendations for: {self.normalize_theme(theme) or '(trending)'}")
+            return entry["items"]
+        return None
+
+    def _cache_recommendations(self, theme, recommendations):
+        # Empty results are not cached so the next request retries
+        if recommendations:
+            self.recommend_cache.set(self._recommend_cache_key(theme),
+                                     {"generated_at": time.time(), "items": recommendations})
+
+    def _generate_recommendations(self, theme, priority=PRIORITY_INTERACTIVE):
+        text = self._generate(FLASH_MODEL_NAME, self._recommend_prompt(theme), priority,
+                              generation_config=self._recommend_config())
+        recommendations = self.parse_recommendations(text)
+        self._cache_recommendations(theme, recommendations)
+        return recommendations
 
     def recommend_stocks(self, theme):
         """
@@ -51,33 +393,71 @@ class GeminiService:
         if not self.model:
              return [{"name": "Mock Stock", "ticker": "000000", "reason": "API Key Missing"}]
 
-        if not theme or theme.strip() == "":
-            prompt = "Recommend 3 trending stocks based on recent major news, high search volume, and government policy announcements. Provide detailed reasons explaining why it is trending. Return JSON with name, ticker, reason, valuation, risk. (Translate all content to Korean)"
-        else:
-            prompt = f"Recommend 3 stocks related to '{theme}'. Provide detailed reasons for the recommendation. Return JSON with name, ticker, reason, valuation, risk. (Translate all content to Korean)"
-        
+        self._ensure_trending_refresher()
+        cached = self._cached_recommendations(theme)
+        if cached is not None:
+            return cached
+
         try:
-            response = self.model.generate_content(prompt)
-            # Try to parse JSON from response. Simple heuristic.
-            text = response.text
-            # Use a more robust parser in production. Here assuming well-formed JSON from strong prompt.
-            start = text.find('[')
-            end = text.rfind(']') + 1
-            if start != -1 and end != -1:
-                return json.loads(text[start:end])
-            return []
+            return self._generate_recommendations(theme)
         except Exception as e:
+            print(f"[Gemini] Recommendation failed: {e}")
             return []
 
-    def analyze_link_content(self, title, content):
+    def stream_recommend_stocks(self, theme):
         """
-        Analyzes the content of a news link to recommend stocks.
-        Uses Flash model for speed.
+        Streaming variant of recommend_stocks. Yields raw JSON text chunks;
+        pass the joined text to parse_recommendations once it is complete.
         """
         if not self.model:
-             return "Gemini API Not Configured"
+            yield json.dumps([{"name": "Mock Stock", "ticker": "000000", "reason": "API Key Missing"}])
+            return
 
-        prompt = f"""
+        self._ensure_trending_refresher()
+        cached = self._cached_recommendations(theme)
+        if cached is not None:
+            yield json.dumps(cached, ensure_ascii=False)
+            return
+
+        chunks = []
+        try:
+            for text in self._stream_text(FLASH_MODEL_NAME, self._recommend_prompt(theme),
+                                          generation_config=self._recommend_config()):
+                chunks.append(text)
+                yield text
+        except Exception as e:
+            print(f"[Gemini] Recommendation stream failed: {e}")
+            return
+
+        self._cache_recommendations(theme, self.parse_recommendations("".join(chunks)))
+
+    def start_trending_refresher(self):
+        self._ensure_trending_refresher()
+
+    def _ensure_trending_refresher(self):
+        # Threads do not survive fork, so (re)start in each worker process
+        if self.trending_refresh_interval <= 0 or self._trending_refresher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._trending_refresher_pid == os.getpid():
+                return
+            self._trending_refresher_pid = os.getpid()
+        threading.Thread(target=self._trending_loop, name="trending-refresher", daemon=True).start()
+
+    def _trending_loop(self):
+        while True:
+            try:
+                # The cache is shared, so whichever worker finds it due refreshes it
+                entry = self.recommend_cache.get(self._recommend_cache_key(""))
+                if self.model and (entry is None or time.time() - entry["generated_at"] >= self.trending_refresh_interval):
+                    print("[Gemini] Refreshing trending recommendations.")
+                    self._generate_recommendations("", PRIORITY_BATCH)
+            except Exception as e:
+                print(f"[Gemini] Trending refresh failed: {e}")
+            time.sleep(min(self.trending_refresh_interval, 300))
+
+    def _link_prompt(self, title, content):
+        return f"""
         Analyze the following news content and recommend related stocks (Korean or US).
         
         [Title]: {title}
@@ -86,10 +466,100 @@ class GeminiService:
         Provide recommendations in this structure (Answer in Korean):
         1. [Stock Name] (Ticker): Reason based on the news
         """
+
+    def _link_cache_key(self, title, content):
+        # Hash exactly what the prompt sees, so URL variants of one article match
+        payload = json.dumps([LINK_PROMPT_VERSION, FLASH_MODEL_NAME, title, content[:2000]], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def analyze_link_content(self, title, content):
+        """
+        Analyzes the content of a news link to recommend stocks.
+        Uses Flash model for speed. Repeat articles are served from the link cache.
+        """
+        if not self.model:
+             return "Gemini API Not Configured"
+
+        cache_key = self._link_cache_key(title, content)
+        cached = self.link_cache.get(cache_key)
+        if cached is not None:
+            print(f"[Gemini] Serving cached link analysis: {title}")
+            return cached
+
         try:
-            response = self.model.generate_content(prompt)
-            return response.text
+            result = self._generate(FLASH_MODEL_NAME, self._link_prompt(title, content))
         except Exception as e:
             return f"Error analyzing link: {str(e)}"
 
+        self.link_cache.set(cache_key, result)
+        return result
+
+    def stream_link_content(self, title, content):
+        """Streaming variant of analyze_link_content. Yields text chunks."""
+        if not self.model:
+            yield "Gemini API Not Configured"
+            return
+
+        cache_key = self._link_cache_key(title, content)
+        cached = self.link_cache.get(cache_key)
+        if cached is not None:
+            print(f"[Gemini] Serving cached link analysis: {title}")
+            yield cached
+            return
+
+        chunks = []
+        try:
+            for text in self._stream_text(FLASH_MODEL_NAME, self._link_prompt(title, content)):
+                chunks.append(text)
+                yield text
+        except Exception as e:
+            yield f"Error analyzing link: {str(e)}"
+            return
+
+        self.link_cache.set(cache_key, "".join(chunks))
+
+    def score_headlines(self, titles):
+        """
+        Classifies sentiment and market impact of many headlines in one call.
+        Returns a list of {"sentiment", "impact"} aligned with titles,
+        or None if the model is unavailable or the output is unusable.
+        """
+        if not self.model or not titles:
+            return None
+
+        numbered = "\n".join(f"{i}. {title}" for i, title in enumerate(titles))
+        prompt = f"""
+        Classify the stock market sentiment of each news headline below and summarize
+        its likely market impact in one short sentence (Answer in Korean).
+        Return a JSON array with one object per headline:
+        {{"index": <number>, "sentiment": "positive" | "negative" | "neutral", "impact": "<sentence>"}}
+
+        {numbered}
+        """
+        try:
+            # Background work: yields to interactive calls, and gives up quickly
+            # since the lexicon fallback is always available
+            scored = json.loads(self._generate(
+                FLASH_MODEL_NAME, prompt, PRIORITY_BATCH, timeout=self.scoring_wait,
+                generation_config={"response_mime_type": "application/json"}
+            ))
+        except Exception as e:
+            print(f"[Gemini] Headline scoring failed: {e}")
+            return None
+
+        results = [None] * len(titles)
+        for entry in scored if isinstance(scored, list) else []:
+            try:
+                index = int(entry.get("index"))
+            except (AttributeError, TypeError, ValueError):
+                continue
+            sentiment = entry.get("sentiment")
+            if 0 <= index < len(titles) and sentiment in ("positive", "negative", "neutral"):
+                results[index] = {"sentiment": sentiment, "impact": str(entry.get("impact", ""))}
+
+        if any(result is None for result in results):
+            print("[Gemini] Headline scoring returned incomplete results.")
+            return None
+        return results
+
 gemini_service = GeminiService()
@@ -0,0 +1,35 @@
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+class HttpService:
+    """
+    Shared, pooled HTTP session for outbound requests (RSS, page scraping).
+    Each process gets its own session so pooled sockets are never shared
+    across a fork.
+    """
+    def __init__(self):
+        self.pool_size = int(os.getenv("HTTP_POOL_SIZE", 16))
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._session = self._create_session()
+                    self._pid = os.getpid()
+        return self._session
+
+    def _create_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers['User-Agent'] = 'Mozilla/5.0'
+        return session
+
+http_service = HttpService()
@@ -0,0 +1,416 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
+from services.cache_service import CACHE_DIR
+from services.runtime_service import runtime_service
+
+# Identifies this server run. gunicorn.conf.py sets it in the master so all
+# workers share it; in-flight jobs recorded by an earlier run never finish.
+RUN_ID = os.environ.setdefault("JOB_RUN_ID", uuid.uuid4().hex)
+
+ABANDONED = "The worker running this job exited before it finished"
+
+class Job:
+    def __init__(self, key, job_id=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.key = key
+        self.status = "queued" # queued -> running -> done | error
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.done = threading.Event()
+        self.chunks = [] # Text published while running (streaming jobs)
+        self._updated = threading.Condition()
+        self._callbacks = []
+        self._callback_lock = threading.Lock()
+
+    def publish(self, text):
+        with self._updated:
+            self.chunks.append(text)
+            self._updated.notify_all()
+
+    def stream(self):
+        """
+        Yields every chunk published so far, then new ones as they arrive,
+        until the job finishes. Jobs that publish nothing yield nothing.
+        """
+        sent = 0
+        while True:
+            with self._updated:
+                while sent == len(self.chunks) and not self.done.is_set():
+                    self._updated.wait()
+                chunks = self.chunks[sent:]
+                finished = self.done.is_set()
+            yield from chunks
+            sent += len(chunks)
+            if finished:
+                return
+
+    def add_done_callback(self, fn):
+        """Calls fn(job) when the job finishes (immediately if it already has)."""
+        with self._callback_lock:
+            if not self.done.is_set():
+                self._callbacks.append(fn)
+                return
+        fn(self)
+
+    def _fire_callbacks(self):
+        with self._callback_lock:
+            callbacks, self._callbacks = self._callbacks, []
+            self.done.set()
+        with self._updated:
+            self._updated.notify_all()
+        for fn in callbacks:
+            try:
+                fn(self)
+            except Exception as e:
+                print(f"[Jobs] Callback for job {self.id} failed: {e}")
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error
+        }
+
+class JobStore:
+    """
+    Job states in SQLite, shared by every gunicorn worker, so a job can be
+    polled or joined from a worker other than the one running it. Each row
+    records the run and process that owns the job; an in-flight row whose
+    owner has exited is marked failed when it is next looked at.
+    """
+    def __init__(self, ttl):
+        self.path = os.getenv("JOB_STORE_PATH", os.path.join(CACHE_DIR, "jobs.sqlite3"))
+        self.ttl = ttl
+        self._prune_interval = 300
+        self._pruned_at = 0
+        self._ready_pid = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # A connection per operation keeps this safe across threads and forks.
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+    def _ensure_ready(self):
+        if self._ready_pid == os.getpid():
+            return
+        with self._lock:
+            if self._ready_pid == os.getpid():
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with closing(self._connect()) as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(
+                    "CREATE TABLE IF NOT EXISTS jobs ("
+                    " id TEXT PRIMARY KEY,"
+                    " key TEXT NOT NULL,"
+                    " status TEXT NOT NULL,"
+                    " result TEXT,"
+                    " error TEXT,"
+                    " run_id TEXT NOT NULL,"
+                    " pid INTEGER NOT NULL,"
+                    " created_at REAL NOT NULL,"
+                    " finished_at REAL);"
+                    "CREATE INDEX IF NOT EXISTS idx_jobs_key ON jobs(key);"
+                    "CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs(finished_at);"
+                )
+            self._ready_pid = os.getpid()
+
+    def claim(self, job):
+        """
+        Records job as this process's, unless a live process already runs a
+        job with the same key: returns that job's row then, otherwise None.
+        """
+        try:
+            self._ensure_ready()
+            with closing(self._connect()) as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                rows = conn.execute(
+                    "SELECT * FROM jobs WHERE key = ? AND finished_at IS NULL", (job.key,)
+                ).fetchall()
+                for row in map(self._row, rows):
+                    if self.owner_alive(row):
+                        conn.execute("COMMIT")
+                        return row
+                    self._abandon(conn, row)
+                self._save(conn, job)
+                conn.execute("COMMIT")
+                self._prune(conn)
+        except sqlite3.Error as e:
+            # Still runs, just without cross-worker sharing
+            print(f"[Jobs] Store error ({self.path}): {e}")
+        return None
+
+    def save(self, job):
+        try:
+            self._ensure_ready()
+            with closing(self._connect()) as conn:
+                self._save(conn, job)
+        except sqlite3.Error as e:
+            print(f"[Jobs] Store error ({self.path}): {e}")
+
+    def _save(self, conn, job):
+        conn.execute(
+            "INSERT INTO jobs (id, key, status, result, error, run_id, pid, created_at, finished_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(id) DO UPDATE SET"
+            " status = excluded.status, result = excluded.result, error = excluded.error,"
+            " finished_at = excluded.finished_at",
+            (job.id, job.key, job.status, json.dumps(job.result, ensure_ascii=False), job.error,
+             RUN_ID, os.getpid(), job.created_at, job.finished_at)
+        )
+
+    def load(self, job_ids):
+        """{job_id: row} for the stored jobs among job_ids, or None if the store is unreadable."""
+        if not job_ids:
+            return {}
+        try:
+            self._ensure_ready()
+            with closing(self._connect()) as conn:
+                placeholders = ",".join("?" * len(job_ids))
+                rows = conn.execute(f"SELECT * FROM jobs WHERE id IN ({placeholders})", list(job_ids)).fetchall()
+            return {row["id"]: row for row in map(self._row, rows)}
+        except sqlite3.Error as e:
+            print(f"[Jobs] Store error ({self.path}): {e}")
+            return None
+
+    def abandon(self, row):
+        """Marks an in-flight row whose owner has exited as failed. Returns the updated row."""
+        try:
+            self._ensure_ready()
+            with closing(self._connect()) as conn:
+                return self._abandon(conn, row)
+        except sqlite3.Error as e:
+            print(f"[Jobs] Store error ({self.path}): {e}")
+            return {**row, "status": "error", "error": ABANDONED, "finished_at": time.time()}
+
+    def _abandon(self, conn, row):
+        row = {**row, "status": "error", "error": ABANDONED, "finished_at": time.time()}
+        conn.execute("UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ? AND finished_at IS NULL",
+                     (row["status"], row["error"], row["finished_at"], row["id"]))
+        return row
+
+    def _prune(self, conn):
+        now = time.time()
+        if now - self._pruned_at < self._prune_interval:
+            return
+        self._pruned_at = now
+        conn.execute("DELETE FROM jobs WHERE finished_at < ?", (now - self.ttl,))
+
+    @staticmethod
+    def _row(values):
+        row = dict(zip(("id", "key", "status", "result", "error", "run_id", "pid", "created_at", "finished_at"), values))
+        row["result"] = json.loads(row["result"]) if row["result"] is not None else None
+        return row
+
+    @staticmethod
+    def owner_alive(row):
+        if row["run_id"] != RUN_ID:
+            return False
+        if row["pid"] == os.getpid() or os.name == "nt": # No gunicorn workers on Windows
+            return True
+        try:
+            os.kill(row["pid"], 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+class JobService:
+    """
+    Runs slow calls (deep research, etc.) on a bounded thread pool so HTTP
+    workers only submit and poll. Submissions with the same key while a job
+    is queued or running attach to that job instead of starting a new one,
+    in any worker: job states are kept in a JobStore, and jobs running in
+    another worker are followed by polling it.
+    """
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(
+            max_workers=runtime_service.io_workers("JOB_WORKERS", 4),
+            thread_name_prefix="job"
+        )
+        self._jobs = {} # {job_id: Job}
+        self._inflight = {} # {key: Job}
+        self._remote = {} # {job_id: Job} running in other workers, not finished yet
+        self._lock = threading.Lock()
+        self._job_ttl = 3600 # Finished jobs are kept for an hour
+        self._store = JobStore(self._job_ttl)
+        self._poll_interval = float(os.getenv("JOB_POLL_INTERVAL", 0.5))
+        self._watcher_pid = None
+
+    def submit(self, key, fn, *args, **kwargs):
+        """
+        Queues fn(*args, **kwargs) and returns its Job.
+        If a job with the same key is still in flight, returns that job.
+        """
+        job, created = self.create(key)
+        if created:
+            self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def submit_stream(self, key, fn, *args, **kwargs):
+        """
+        Like submit, for a generator of text chunks: each chunk is published
+        to job.stream() readers as it arrives, and the joined text is the result.
+        Readers in other workers receive no chunks, only the result.
+        """
+        job, created = self.create(key)
+        if created:
+            self._executor.submit(self._run, job, self._publish_all, (job, fn, args, kwargs), {})
+        return job
+
+    def _publish_all(self, job, fn, args, kwargs):
+        for text in fn(*args, **kwargs):
+            job.publish(text)
+        return "".join(job.chunks)
+
+    def create(self, key):
+        """
+        Registers a job that the caller completes with finish(), for work that
+        runs elsewhere (e.g. chained futures). Returns (job, created); created
+        is False if an in-flight job with the same key was returned instead.
+        """
+        with self._lock:
+            self._prune()
+            job = self._inflight.get(key)
+            if job:
+                print(f"[Jobs] Attached to in-flight job {job.id} for: {key}")
+                return job, False
+
+            job = Job(key)
+            running = self._store.claim(job)
+            if running:
+                print(f"[Jobs] Attached to job {running['id']} in worker {running['pid']} for: {key}")
+                return self._follow(running), False
+
+            self._jobs[job.id] = job
+            self._inflight[key] = job
+            return job, True
+
+    def completed(self, key, result):
+        """A job that is already done, for results available without running anything (e.g. cached)."""
+        job = Job(key)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self.finish(job, result=result)
+        return job
+
+    def finish(self, job, result=None, error=None):
+        if error is not None:
+            print(f"[Jobs] Job {job.id} failed: {error}")
+            job.error = str(error)
+            job.status = "error"
+        else:
+            job.result = result
+            job.status = "done"
+        job.finished_at = time.time()
+        self._store.save(job)
+        with self._lock:
+            if self._inflight.get(job.key) is job:
+                del self._inflight[job.key]
+        job._fire_callbacks()
+
+    def get(self, job_id):
+        """The job with this id, from any worker, or None if it is unknown or expired."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job:
+            return job
+        row = (self._store.load([job_id]) or {}).get(job_id)
+        if not row:
+            return None
+        with self._lock:
+            return self._jobs.get(job_id) or self._follow(row)
+
+    def _follow(self, row):
+        """A local Job mirroring a stored one, kept up to date until it finishes. Caller holds _lock."""
+        job = Job(row["key"], job_id=row["id"])
+        job.created_at = row["created_at"]
+        self._jobs[job.id] = job
+        if row["finished_at"] is not None or not self._store.owner_alive(row):
+            if row["finished_at"] is None:
+                row = self._store.abandon(row)
+            self._apply(job, row)
+            job.done.set() # Nobody can have added a callback yet
+            return job
+
+        job.status = row["status"]
+        self._inflight.setdefault(job.key, job)
+        self._remote[job.id] = job
+        if self._watcher_pid != os.getpid():
+            self._watcher_pid = os.getpid()
+            threading.Thread(target=self._watch_remote, name="job-watcher", daemon=True).start()
+        return job
+
+    @staticmethod
+    def _apply(job, row):
+        job.status = row["status"]
+        job.result = row["result"]
+        job.error = row["error"]
+        job.finished_at = row["finished_at"]
+
+    def _watch_remote(self):
+        # One thread per process, running while there are jobs to follow
+        while True:
+            time.sleep(self._poll_interval)
+            with self._lock:
+                if not self._remote:
+                    self._watcher_pid = None
+                    return
+                watched = dict(self._remote)
+
+            rows = self._store.load(list(watched))
+            if rows is None:
+                continue
+            for job_id, job in watched.items():
+                row = rows.get(job_id)
+                if row is None:
+                    row = {"status": "error", "result": None, "error": "Job expired", "finished_at": time.time()}
+                elif row["finished_at"] is None:
+                    if self._store.owner_alive(row):
+                        job.status = row["status"]
+                        continue
+                    row = self._store.abandon(row)
+
+                self._apply(job, row)
+                with self._lock:
+                    del self._remote[job_id]
+                    if self._inflight.get(job.key) is job:
+                        del self._inflight[job.key]
+                job._fire_callbacks()
+
+    def wait(self, job, timeout=None):
+        """Blocks until the job finishes or timeout elapses. Returns the job."""
+        job.done.wait(timeout)
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = "running"
+        self._store.save(job)
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self.finish(job, error=e)
+        else:
+            self.finish(job, result=result)
+
+    def _prune(self):
+        cutoff = time.time() - self._job_ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished_at and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+job_service = JobService()
@@ -1,64 +1,180 @@
 import json
 import os
+import stat
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
 
-from services.drive_service import drive_service
+try:
+    import fcntl
+except ImportError: # Windows: fall back to in-process locking only
+    fcntl = None
+
+from services.drive_service import drive_service, DriveSyncer
+from services.startup_service import startup_service
 
 KEYWORDS_FILE = "keywords.json"
+LOCK_FILE = KEYWORDS_FILE + ".lock"
 
 class KeywordService:
+    """
+    Keywords are kept in memory and reloaded only when keywords.json changes
+    on disk (e.g. written by another gunicorn worker). Writes are serialized
+    with a file lock and replace the file atomically. The initial pull from
+    Drive happens on first use in each process, not at import.
+    """
     def __init__(self):
-        self._ensure_file_exists()
+        self._keywords = []
+        self._version = None # (mtime_ns, size) of the file we last loaded
+        self._checked_at = 0
+        self._check_interval = 1 # Seconds between mtime checks
+        self._lock = threading.Lock()
+        # Edits return immediately; Drive receives them shortly after
+        self._drive_syncer = DriveSyncer(drive_service, KEYWORDS_FILE, KEYWORDS_FILE)
+        self._ready_pid = None
+
+    def _ensure_ready(self):
+        if self._ready_pid == os.getpid():
+            return
+        with self._lock:
+            if self._ready_pid != os.getpid():
+                with startup_service.timed("keywords", "init"):
+                    self._ensure_file_exists()
+                self._ready_pid = os.getpid()
 
     def _ensure_file_exists(self):
-        # Try to download from Drive first
+        # The local file is the source of truth once it exists: it may hold
+        # edits that the write-behind has not uploaded yet (debounce, retry
+        # backoff, or a worker killed before its exit flush), so Drive only
+        # seeds a fresh deployment. That is why keywords.json is not tracked
+        # in git: a checked-in copy would shadow the user's keywords on Drive.
+        # Checked again under the file lock so a concurrent edit in another
+        # worker is never overwritten.
+        if os.path.exists(KEYWORDS_FILE):
+            return
+        with self._flock():
+            if os.path.exists(KEYWORDS_FILE):
+                return
+            try:
+                file_id = drive_service.search_file(KEYWORDS_FILE)
+                if file_id:
+                    print(f"[Keywords] Found remote file (ID: {file_id}), downloading...")
+                    if drive_service.download_file(file_id, KEYWORDS_FILE):
+                        return
+            except Exception as e:
+                print(f"[Keywords] Drive sync error: {e}")
+
+            # Not on Drive or the download failed: use defaults
+            self._write_local(["반도체", "2차전지", "AI"])
+
+    def get_keywords(self, with_version=False):
+        """
+        With with_version=True, returns (keywords, version) where version
+        identifies the keywords.json contents they were loaded from.
+        """
+        self._ensure_ready()
+        now = time.time()
+        if now - self._checked_at >= self._check_interval:
+            self._checked_at = now
+            version = self._file_version()
+            if version != self._version:
+                with self._lock:
+                    self._reload()
+        with self._lock:
+            keywords, version = list(self._keywords), self._version
+        if with_version:
+            return keywords, "-".join(map(str, version or ()))
+        return keywords
+
+    def _file_version(self):
         try:
-            file_id = drive_service.search_file(KEYWORDS_FILE)
-            if file_id:
-                print(f"[Keywords] Found remote file (ID: {file_id}), downloading...")
-                success = drive_service.download_file(file_id, KEYWORDS_FILE)
-                if success:
-                    return
-        except Exception as e:
-            print(f"[Keywords] Drive sync error: {e}")
-
-        # If not on drive or download failed, use local or defaults
-        if not os.path.exists(KEYWORDS_FILE):
-            with open(KEYWORDS_FILE, 'w', encoding='utf-8') as f:
-                json.dump(["반도체", "2차전지", "AI"], f, ensure_ascii=False) # Defaults
-
-    def get_keywords(self):
+            st = os.stat(KEYWORDS_FILE)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def _reload(self):
+        version = self._file_version()
         try:
             with open(KEYWORDS_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
+                self._keywords = json.load(f)
         except:
-            return []
+            self._keywords = []
+        self._version = version
+
+    @contextmanager
+    def _file_lock(self):
+        """Serializes read-modify-write across threads and worker processes."""
+        self._ensure_ready()
+        with self._lock, self._flock():
+            # Re-read under the lock so edits from other workers are not lost
+            self._reload()
+            yield
+
+    @contextmanager
+    def _flock(self):
+        """The cross-process part of _file_lock (callers hold self._lock)."""
+        with open(LOCK_FILE, 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
 
     def add_keyword(self, keyword):
-        keywords = self.get_keywords()
-        if keyword not in keywords:
+        with self._file_lock():
+            keywords = list(self._keywords)
+            if keyword in keywords:
+                return False
             keywords.append(keyword)
-            self._save(keywords)
-            return True
-        return False
+            self._write_local(keywords)
+        self._sync_to_drive()
+        return True
 
     def remove_keyword(self, keyword):
-        keywords = self.get_keywords()
-        if keyword in keywords:
+        with self._file_lock():
+            keywords = list(self._keywords)
+            if keyword not in keywords:
+                return False
             keywords.remove(keyword)
-            self._save(keywords)
-            return True
-        return False
-
-    def _save(self, keywords):
-        # Save local
-        with open(KEYWORDS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(keywords, f, ensure_ascii=False)
-        
-        # Sync to Drive (Background task would be better, but blocking is safer for now)
+            self._write_local(keywords)
+        self._sync_to_drive()
+        return True
+
+    def _write_local(self, keywords):
+        # Write a temp file and rename it over the original, so readers never
+        # see a half-written file
+        directory = os.path.dirname(os.path.abspath(KEYWORDS_FILE))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".keywords.", suffix=".tmp")
         try:
-            drive_service.upload_json(KEYWORDS_FILE, KEYWORDS_FILE)
-            print("[Keywords] Synced to Drive")
-        except Exception as e:
-            print(f"[Keywords] Failed to sync to Drive: {e}")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(keywords, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            # mkstemp creates the file 0600; keep the mode keywords.json had
+            os.chmod(tmp_path, self._file_mode())
+            os.replace(tmp_path, KEYWORDS_FILE)
+        except:
+            os.remove(tmp_path)
+            raise
+
+        self._keywords = keywords
+        self._version = self._file_version()
+
+    @staticmethod
+    def _file_mode():
+        try:
+            return stat.S_IMODE(os.stat(KEYWORDS_FILE).st_mode)
+        except FileNotFoundError:
+            # New file. Not derived from the umask: reading it means setting
+            # it, which is process-wide and races with other threads
+            return 0o644
+
+    def _sync_to_drive(self):
+        # Write-behind: coalesced and retried in the background
+        self._drive_syncer.mark_dirty()
 
 keyword_service = KeywordService()
@@ -0,0 +1,76 @@
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram,
+                               REGISTRY, generate_latest, multiprocess)
+
+# Deep research calls and SSE streams run for minutes, so go well past the defaults
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+class MetricsService:
+    """
+    Prometheus metrics for routes, external dependencies and caches.
+    Under gunicorn each worker writes to PROMETHEUS_MULTIPROC_DIR (set in
+    gunicorn.conf.py) and /metrics sums them across workers; without it the
+    process-local registry is served.
+    """
+    content_type = CONTENT_TYPE_LATEST
+
+    def __init__(self):
+        self.multiprocess_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+        self.request_latency = Histogram(
+            "http_request_duration_seconds", "Request latency by route, including streamed bodies",
+            ["method", "route", "status"], buckets=LATENCY_BUCKETS
+        )
+        self.requests_in_progress = Gauge(
+            "http_requests_in_progress", "Requests currently being served",
+            ["route"], multiprocess_mode="livesum"
+        )
+        self.dependency_latency = Histogram(
+            "dependency_duration_seconds", "Time spent in external calls",
+            ["dependency", "operation"], buckets=LATENCY_BUCKETS
+        )
+        self.dependency_errors = Counter(
+            "dependency_errors_total", "External calls that raised",
+            ["dependency", "operation"]
+        )
+        self.cache_requests = Counter(
+            "cache_requests_total", "Cache lookups by outcome (hit, stale, miss)",
+            ["cache", "result"]
+        )
+
+    @contextmanager
+    def timed(self, dependency, operation):
+        """Times one external call; exceptions are counted and re-raised."""
+        started = time.perf_counter()
+        try:
+            yield
+        except GeneratorExit:
+            # A stream closed early by its consumer is not a dependency error
+            raise
+        except BaseException:
+            self.dependency_errors.labels(dependency, operation).inc()
+            raise
+        finally:
+            self.dependency_latency.labels(dependency, operation).observe(time.perf_counter() - started)
+
+    def cache_result(self, cache, result):
+        self.cache_requests.labels(cache, result).inc()
+
+    def request_started(self, route):
+        self.requests_in_progress.labels(route).inc()
+
+    def request_finished(self, method, route, status, seconds):
+        self.requests_in_progress.labels(route).dec()
+        self.request_latency.labels(method, route, str(status)).observe(seconds)
+
+    def render(self):
+        """Current metrics in the Prometheus text format."""
+        if self.multiprocess_dir:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+            return generate_latest(registry)
+        return generate_latest(REGISTRY)
+
+metrics_service = MetricsService()
@@ -0,0 +1,182 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+from services.cache_service import CACHE_DIR
+from services.metrics_service import metrics_service
+
+# The trigram tokenizer indexes every 3-character window, so substring
+# queries work for Korean (no word segmentation needed). Shorter terms
+# ("AI") cannot use the index and fall back to a case-sensitive instr(),
+# like the `k in title` filter, so "AI" does not match "Taiwan ... said".
+MIN_MATCH_CHARS = 3
+
+class NewsArchiveService:
+    """
+    Every fetched headline, kept in SQLite beyond the feed cache's TTL and
+    deduplicated by link, with an FTS5 trigram index over titles. Shared by
+    all gunicorn workers; headline scores are stored alongside so a link is
+    scored once per archive, not once per process.
+    """
+    def __init__(self):
+        self.path = os.getenv("NEWS_ARCHIVE_PATH", os.path.join(CACHE_DIR, "news_archive.sqlite3"))
+        self.retention_days = int(os.getenv("NEWS_ARCHIVE_RETENTION_DAYS", 180))
+        self._prune_interval = 3600
+        self._pruned_at = 0
+        self._ready_pid = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # A connection per operation keeps this safe across threads and forks.
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+    def _ensure_ready(self):
+        if self._ready_pid == os.getpid():
+            return
+        with self._lock:
+            if self._ready_pid == os.getpid():
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with closing(self._connect()) as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(
+                    "CREATE TABLE IF NOT EXISTS articles ("
+                    " id INTEGER PRIMARY KEY,"
+                    " link TEXT NOT NULL UNIQUE,"
+                    " title TEXT NOT NULL,"
+                    " pub_date TEXT,"
+                    " published_ts INTEGER NOT NULL,"
+                    " sentiment TEXT,"
+                    " impact TEXT,"
+                    " first_seen REAL NOT NULL);"
+                    "CREATE INDEX IF NOT EXISTS idx_articles_published ON articles(published_ts);"
+                    "CREATE INDEX IF NOT EXISTS idx_articles_first_seen ON articles(first_seen);"
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5("
+                    " title, content='articles', content_rowid='id', tokenize='trigram');"
+                    # Keep the external-content index in step with the table
+                    "CREATE TRIGGER IF NOT EXISTS articles_ai AFTER INSERT ON articles BEGIN"
+                    " INSERT INTO articles_fts(rowid, title) VALUES (new.id, new.title); END;"
+                    "CREATE TRIGGER IF NOT EXISTS articles_ad AFTER DELETE ON articles BEGIN"
+                    " INSERT INTO articles_fts(articles_fts, rowid, title) VALUES ('delete', old.id, old.title); END;"
+                )
+            self._ready_pid = os.getpid()
+
+    def store(self, items):
+        """Adds items not seen before (by link). Returns how many were new."""
+        if not items:
+            return 0
+        now = time.time()
+        rows = [(item["link"], item["title"], item.get("pub_date"),
+                 item.get("published_ts") or int(now), item.get("sentiment"), item.get("impact"), now)
+                for item in items]
+        try:
+            self._ensure_ready()
+            with metrics_service.timed("news_archive", "store"), closing(self._connect()) as conn:
+                before = conn.total_changes
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany(
+                    "INSERT INTO articles (link, title, pub_date, published_ts, sentiment, impact, first_seen)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(link) DO NOTHING",
+                    rows
+                )
+                conn.execute("COMMIT")
+                added = conn.total_changes - before
+                self._prune(conn, now)
+            return added
+        except sqlite3.Error as e:
+            print(f"[Archive] Write error ({self.path}): {e}")
+            return 0
+
+    def _prune(self, conn, now):
+        if now - self._pruned_at < self._prune_interval:
+            return
+        self._pruned_at = now
+        conn.execute("DELETE FROM articles WHERE first_seen < ?", (now - self.retention_days * 86400,))
+
+    def scores(self, links):
+        """{link: {'sentiment', 'impact'}} for archived links that have been scored."""
+        if not links:
+            return {}
+        try:
+            self._ensure_ready()
+            with closing(self._connect()) as conn:
+                placeholders = ",".join("?" * len(links))
+                rows = conn.execute(
+                    f"SELECT link, sentiment, impact FROM articles"
+                    f" WHERE link IN ({placeholders}) AND sentiment IS NOT NULL",
+                    list(links)
+                ).fetchall()
+            return {link: {"sentiment": sentiment, "impact": impact} for link, sentiment, impact in rows}
+        except sqlite3.Error as e:
+            print(f"[Archive] Read error ({self.path}): {e}")
+            return {}
+
+    def set_scores(self, scores):
+        """Stores {link: {'sentiment', 'impact'}} for archived links."""
+        if not scores:
+            return
+        try:
+            self._ensure_ready()
+            with closing(self._connect()) as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany(
+                    "UPDATE articles SET sentiment = ?, impact = ? WHERE link = ?",
+                    [(score.get("sentiment"), score.get("impact"), link) for link, score in scores.items()]
+                )
+                conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            print(f"[Archive] Write error ({self.path}): {e}")
+
+    def search(self, query, since_ts=None, limit=50):
+        """Newest items whose title contains every whitespace-separated term of query."""
+        terms = query.split()
+        if not terms:
+            return []
+        return self._select(terms, " AND ", since_ts, limit)
+
+    def recent(self, keywords, since_ts=None, limit=20):
+        """Newest items whose title contains any of keywords."""
+        keywords = [k for k in keywords if k]
+        if not keywords:
+            return []
+        return self._select(keywords, " OR ", since_ts, limit)
+
+    def _select(self, terms, operator, since_ts, limit):
+        clauses = []
+        params = []
+        for term in terms:
+            if len(term) >= MIN_MATCH_CHARS:
+                clauses.append("id IN (SELECT rowid FROM articles_fts WHERE articles_fts MATCH ?)")
+                params.append('"' + term.replace('"', '""') + '"')
+            else:
+                clauses.append("instr(title, ?) > 0")
+                params.append(term)
+        sql = ("SELECT title, link, pub_date, published_ts, sentiment, impact FROM articles"
+               f" WHERE ({operator.join(clauses)})")
+        if since_ts:
+            sql += " AND published_ts >= ?"
+            params.append(int(since_ts))
+        sql += " ORDER BY published_ts DESC LIMIT ?"
+        params.append(int(limit))
+
+        try:
+            self._ensure_ready()
+            with metrics_service.timed("news_archive", "search"), closing(self._connect()) as conn:
+                rows = conn.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            print(f"[Archive] Search error ({self.path}): {e}")
+            return []
+
+        items = []
+        for title, link, pub_date, published_ts, sentiment, impact in rows:
+            item = {"title": title, "link": link, "pub_date": pub_date, "published_ts": published_ts}
+            if sentiment:
+                item.update({"sentiment": sentiment, "impact": impact})
+            items.append(item)
+        return items
+
+news_archive_service = NewsArchiveService()
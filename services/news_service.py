@@ -1,77 +1,367 @@
 import feedparser
+import calendar
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+from services.cache_service import LRUCache
+from services.clustering_service import clustering_service
+from services.http_service import http_service
+from services.metrics_service import metrics_service
+from services.news_archive_service import news_archive_service
+from services.sentiment_service import sentiment_service
+
 class NewsService:
     def __init__(self):
+        # Overridable so benchmarks can point at a local feed server
+        self.rss_base_url = os.getenv("NEWS_RSS_BASE_URL", "https://news.google.com/rss/search")
         # Google News RSS for "Finance" (Economy/Stock) - More reliable URL
-        self.rss_url = "https://news.google.com/rss/search?q=%EA%B2%BD%EC%A0%9C+%7C+%EC%A3%BC%EC%8B%9D&hl=ko&gl=KR&ceid=KR:ko"
-        self._cache = {} # {query_key: (timestamp, items)}
+        self.rss_url = f"{self.rss_base_url}?q=%EA%B2%BD%EC%A0%9C+%7C+%EC%A3%BC%EC%8B%9D&hl=ko&gl=KR&ceid=KR:ko"
+        # Bounded so arbitrary ?keyword= values cannot grow memory without limit
+        self._cache = LRUCache(
+            max_entries=int(os.getenv("NEWS_CACHE_MAX_ENTRIES", 200)),
+            max_bytes=int(os.getenv("NEWS_CACHE_MAX_BYTES", 8 * 1024 * 1024))
+        ) # {query_key: (timestamp, items, etag, last_modified, version)}
         self._cache_ttl = 600 # 10 minutes
+        self._max_items = 20
+        # Every entry of a feed goes to the archive; keyword views are then
+        # selected from it, like the feed's own "when:3d" window
+        self._feed_max_entries = int(os.getenv("NEWS_FEED_MAX_ENTRIES", 100))
+        self._view_days = 3
+        # Near-duplicate headlines collapse into one story, so candidates
+        # beyond the 20 shown are needed to fill a view
+        self._cluster_pool = self._max_items * 3
+        # "per_keyword": one feed per keyword, cached independently and merged.
+        # "combined": a single OR-query over all keywords (previous behaviour).
+        self.fetch_mode = os.getenv("NEWS_FETCH_MODE", "per_keyword")
+        self._fetch_workers = int(os.getenv("NEWS_FETCH_WORKERS", 8))
+        self._executor = None
+        self._executor_pid = None
+        self._fetch_timeout = float(os.getenv("NEWS_FETCH_TIMEOUT", 5))
+
+        # Stale-while-revalidate: entries are refreshed in the background before
+        # they expire, and expired entries are still served (marked stale).
+        self._refresh_interval = 60 # How often the refresher wakes up
+        self._refresh_margin = 120 # Refresh entries this close to expiry
+        self._refreshing = set() # Cache keys with a refresh in flight
+        self._unscored = set() # Cache keys fetched inline, awaiting remote scoring
+        self._scoring_scheduled = False
+        self._refresh_lock = threading.Lock()
+        self._keyword_provider = None
+        self._refresher_pid = None
 
-    def get_latest_news(self, keywords=None):
+    def get_latest_news(self, keywords=None, with_status=False, with_version=False):
         """
         Fetches latest news with caching.
+        With with_status=True, returns (items, stale) where stale is True if
+        any part was served past its TTL while a refresh runs in the background.
+        With with_version=True, also returns a digest that changes whenever
+        the cached items behind the result change: (items, stale, version).
         """
-        # Create cache key
+        self._ensure_refresher()
+        items, stale, version = self._get_news(keywords)
+        if with_version:
+            return items, stale, version
+        if with_status:
+            return items, stale
+        return items
+
+    def _get_news(self, keywords):
         if not keywords:
-            cache_key = "default"
-        else:
-            cache_key = ",".join(sorted(keywords))
-        
+            return self._get_feed(*self._target(None))
+
+        if self.fetch_mode == "combined" or len(keywords) == 1:
+            return self._get_feed(*self._target(keywords))
+
+        # Per-keyword mode: serve cached keywords (even stale), fetch the rest in parallel
+        results = []
+        misses = []
+        for keyword in keywords:
+            cached = self._lookup(*self._target([keyword]))
+            if cached is None:
+                misses.append(keyword)
+            else:
+                results.append(cached)
+
+        if misses:
+            results.extend(self._pool().map(
+                lambda k: self._get_feed(*self._target([k]), defer_scoring=True), misses
+            ))
+            # All feeds fetched above share one scoring call
+            self._schedule_scoring()
+
+        # Misses answered from the archive are stale too
+        stale = any(s for _, s, _ in results)
+        # Keywords are looked up in order, so the same entries give the same version
+        version = hashlib.sha1("|".join(v for _, _, v in results).encode()).hexdigest()
+        return self._merge([items for items, _, _ in results]), stale, version
+
+    @staticmethod
+    def _items_version(items):
+        return hashlib.sha1(json.dumps(items, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _target(self, keywords):
+        """Returns (cache_key, url, keywords) for a feed."""
+        if not keywords:
+            return "default", self.rss_url, None
+        return ",".join(sorted(keywords)), self._search_url(keywords), keywords
+
+    def _lookup(self, cache_key, target_url, keywords=None):
+        """
+        Returns (items, stale, version) from cache, or None if nothing is cached.
+        Stale entries trigger a background refresh.
+        """
+        entry = self._cache.get(cache_key)
+        if not entry:
+            metrics_service.cache_result("news", "miss")
+            return None
+
+        timestamp, items, _, _, version = entry
+        age = (datetime.now() - timestamp).total_seconds()
+        if age >= self._cache_ttl:
+            metrics_service.cache_result("news", "stale")
+            self._schedule_refresh(cache_key, target_url, keywords)
+            return items, True, version
+        metrics_service.cache_result("news", "hit")
+        return items, False, version
+
+    def _get_feed(self, cache_key, target_url, keywords=None, defer_scoring=False):
         # Check cache
-        if cache_key in self._cache:
-            timestamp, items = self._cache[cache_key]
-            if (datetime.now() - timestamp).total_seconds() < self._cache_ttl:
-                print(f"[News] Serving cached results for: {cache_key}")
-                return items
+        cached = self._lookup(cache_key, target_url, keywords)
+        if cached is not None:
+            print(f"[News] Serving cached results for: {cache_key}")
+            return cached
 
-        base_query_params = " when:3d -시세 -현재가 -등락률" # 3 days + exclusions
-        
-        if keywords and len(keywords) > 0:
-            # Construct query: (k1 OR k2) ...
-            # Google News RSS supports 'q=' parameter
-            query = " OR ".join([f'"{k}"' for k in keywords])
-            final_query = f"({query}){base_query_params}"
-            import urllib.parse
-            encoded_query = urllib.parse.quote(final_query)
-            # Use search RSS format
-            target_url = f"https://news.google.com/rss/search?q={encoded_query}&hl=ko&gl=KR&ceid=KR:ko"
+        # Cold miss: answer from the archive if it has matching headlines
+        # (e.g. after a restart) and refresh in the background
+        if keywords:
+            archived = self._archived_view(keywords)
+            if archived:
+                print(f"[News] Serving archived results for: {cache_key}")
+                sentiment_service.score(archived, remote=False)
+                self._schedule_refresh(cache_key, target_url, keywords)
+                return archived, True, self._items_version(archived)
+
+        # Nothing to serve yet, fetch now (bounded by the timeout). Gemini
+        # scoring has no deadline, so it is left to the background
+        items = self._refresh(cache_key, target_url, keywords, remote_scoring=False)
+        if items is None:
+            items = []
         else:
-            # Fallback or default topic
-            target_url = self.rss_url
+            self._pool() # Per-process state is reset on first use after fork
+            with self._refresh_lock:
+                self._unscored.add(cache_key)
+            if not defer_scoring:
+                self._schedule_scoring()
+        return items, False, self._items_version(items)
+
+    def _refresh(self, cache_key, target_url, keywords=None, remote_scoring=True):
+        result = self._fetch(target_url, keywords, self._cache.peek(cache_key), remote_scoring)
+        if result is None:
+            return None
+
+        items, etag, last_modified = result
+        # Update cache. A 304 keeps the same items and therefore the same version
+        self._cache.set(cache_key, (datetime.now(), items, etag, last_modified, self._items_version(items)))
+        return items
+
+    def _schedule_refresh(self, cache_key, target_url, keywords=None):
+        pool = self._pool()
+        with self._refresh_lock:
+            if cache_key in self._refreshing:
+                return
+            self._refreshing.add(cache_key)
+
+        def run():
+            try:
+                # On failure the old entry stays in place and keeps being served
+                self._refresh(cache_key, target_url, keywords)
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(cache_key)
+
+        pool.submit(run)
+
+    def _schedule_scoring(self):
+        """Scores the items of entries fetched inline remotely, in the background."""
+        pool = self._pool()
+        with self._refresh_lock:
+            if not self._unscored or self._scoring_scheduled:
+                return
+            self._scoring_scheduled = True
+        pool.submit(self._score_unscored)
+
+    def _score_unscored(self):
+        with self._refresh_lock:
+            keys, self._unscored = self._unscored, set()
+            self._scoring_scheduled = False
+        entries = {key: entry for key, entry in ((key, self._cache.peek(key)) for key in keys) if entry}
+        scored = {key: [dict(item) for item in entry[1]] for key, entry in entries.items()}
+        # One batched call for every feed fetched inline since the last run
+        sentiment_service.score([item for items in scored.values() for item in items])
+        for key, entry in entries.items():
+            # Leave entries that a refresh replaced in the meantime
+            if self._cache.peek(key) is entry:
+                items = scored[key]
+                self._cache.set(key, (entry[0], items, entry[2], entry[3], self._items_version(items)))
+
+    def _pool(self):
+        # Worker threads do not survive fork, so each process gets its own pool
+        with self._refresh_lock:
+            if self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._fetch_workers,
+                    thread_name_prefix="news"
+                )
+                self._executor_pid = os.getpid()
+                self._refreshing = set()
+                self._unscored = set()
+                self._scoring_scheduled = False
+            return self._executor
+
+    def set_keyword_provider(self, keyword_provider):
+        """
+        Keeps feeds for every keyword returned by keyword_provider() warm,
+        re-fetching them in the background shortly before they expire.
+        The refresher thread starts on first use in each process.
+        """
+        self._keyword_provider = keyword_provider
+
+    def start_refresher(self):
+        self._ensure_refresher()
+
+    def _ensure_refresher(self):
+        # Threads do not survive fork, so (re)start in each worker process
+        if self._keyword_provider is None or self._refresher_pid == os.getpid():
+            return
+        with self._refresh_lock:
+            if self._refresher_pid == os.getpid():
+                return
+            self._refresher_pid = os.getpid()
+        threading.Thread(target=self._refresh_loop, name="news-refresher", daemon=True).start()
+
+    def _refresh_loop(self):
+        while True:
+            try:
+                self._refresh_due()
+            except Exception as e:
+                print(f"[News] Refresher error: {e}")
+            time.sleep(self._refresh_interval)
+
+    def _refresh_due(self):
+        keywords = self._keyword_provider() or []
+        targets = [self._target([k]) for k in keywords]
+        if not keywords:
+            targets.append(self._target(None))
+        elif self.fetch_mode == "combined" and len(keywords) > 1:
+            targets.append(self._target(keywords))
+
+        for cache_key, target_url, target_keywords in targets:
+            entry = self._cache.peek(cache_key)
+            if entry:
+                age = (datetime.now() - entry[0]).total_seconds()
+                if age < self._cache_ttl - self._refresh_margin:
+                    continue
+            self._schedule_refresh(cache_key, target_url, target_keywords)
+
+    def _search_url(self, keywords):
+        base_query_params = " when:3d -시세 -현재가 -등락률" # 3 days + exclusions
+
+        # Construct query: (k1 OR k2) ...
+        # Google News RSS supports 'q=' parameter
+        query = " OR ".join([f'"{k}"' for k in keywords])
+        final_query = f"({query}){base_query_params}"
+        encoded_query = urllib.parse.quote(final_query)
+        # Use search RSS format
+        return f"{self.rss_base_url}?q={encoded_query}&hl=ko&gl=KR&ceid=KR:ko"
+
+    def _fetch(self, target_url, keywords=None, entry=None, remote_scoring=True):
+        """
+        Downloads and parses one feed, revalidating against a cached entry.
+        Returns (items, etag, last_modified), or None on failure so errors are not cached.
+        With remote_scoring=False, headlines not scored before get lexicon scores.
+        """
+        headers = {}
+        if entry:
+            _, _, etag, last_modified, _ = entry
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
 
         try:
-            feed = feedparser.parse(target_url)
-            news_items = []
-
-            for entry in feed.entries[:20]: # Limit to 20 items
-                title = entry.title
-                link = entry.link
-                pub_date = entry.published
-                
-                # Simple keyword filtering
-                if keywords:
-                    if not any(k in title for k in keywords):
-                        continue
-
-                import random
-                sentiment = random.choice(['neutral', 'positive', 'negative'])
-                impact_summary = "AI가 분석한 이 뉴스의 시장 영향도 요약입니다."
-
-                news_items.append({
-                    "title": title,
-                    "link": link,
-                    "pub_date": pub_date,
-                    "sentiment": sentiment,
-                    "impact": impact_summary
+            # feedparser has no timeout of its own, so download first
+            with metrics_service.timed("news_feed", "fetch"):
+                response = http_service.session.get(target_url, headers=headers,
+                                                    timeout=self._fetch_timeout)
+            if response.status_code == 304 and entry:
+                # Unchanged upstream: extend the TTL without re-parsing
+                return entry[1], entry[2], entry[3]
+            response.raise_for_status()
+            with metrics_service.timed("news_feed", "parse"):
+                feed = feedparser.parse(response.content)
+            parsed = []
+
+            for entry in feed.entries[:self._feed_max_entries]:
+                published = entry.get('published_parsed')
+                parsed.append({
+                    "title": entry.title,
+                    "link": entry.link,
+                    "pub_date": entry.published,
+                    "published_ts": calendar.timegm(published) if published else 0
                 })
-            
-            # Update cache
-            self._cache[cache_key] = (datetime.now(), news_items)
-            return news_items
-            
+
+            news_archive_service.store(parsed)
+            if keywords:
+                # Matching headlines from this and earlier fetches (and other
+                # feeds); the substring filter is the fallback if the archive fails
+                news_items = (self._archived_view(keywords) or
+                              self._stories([item for item in parsed if any(k in item["title"] for k in keywords)]))
+            else:
+                news_items = self._stories(parsed)
+
+            # One batched scoring call per feed refresh, for story
+            # representatives only; already-seen links are memoized
+            sentiment_service.score(news_items, remote=remote_scoring)
+            return news_items, response.headers.get('ETag'), response.headers.get('Last-Modified')
+
         except Exception as e:
             print(f"[News] Fetch error: {e}")
-            return []
+            return None
+
+    def _archived_view(self, keywords):
+        return self._stories(news_archive_service.recent(
+            keywords, since_ts=time.time() - self._view_days * 86400, limit=self._cluster_pool))
+
+    def _stories(self, items):
+        """Up to 20 items, one per story, each with its near-duplicates under 'alternates'."""
+        return clustering_service.cluster(items[:self._cluster_pool])[:self._max_items]
+
+    def search(self, query, days=None, limit=50):
+        """Full-text search over archived headlines, newest first."""
+        since_ts = time.time() - days * 86400 if days else None
+        return news_archive_service.search(query, since_ts=since_ts, limit=limit)
+
+    def _merge(self, results):
+        """
+        Merges per-keyword lists, newest first, dropping duplicate links and
+        folding the same story reported under different keywords into one.
+        """
+        seen = set()
+        merged = []
+        for items in results:
+            for item in items:
+                if item["link"] in seen:
+                    continue
+                seen.add(item["link"])
+                merged.append(item)
+
+        merged.sort(key=lambda item: item["published_ts"], reverse=True)
+        return self._stories(merged)
 
 news_service = NewsService()
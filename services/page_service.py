@@ -0,0 +1,132 @@
+import os
+import threading
+import time
+import urllib.parse
+from bs4 import BeautifulSoup, SoupStrainer
+
+from services.cache_service import LRUCache
+from services.http_service import http_service
+from services.metrics_service import metrics_service
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = {"fbclid", "gclid", "igshid", "mc_cid", "mc_eid", "ref", "ref_src", "spm"}
+
+class PageService:
+    """
+    Fetches article pages for link analysis over the shared HTTP pool, with
+    connect/read timeouts, a byte cap, a cache keyed by canonical URL, and
+    one fetch per URL no matter how many requests ask for it at once.
+    """
+    def __init__(self):
+        self.connect_timeout = float(os.getenv("PAGE_CONNECT_TIMEOUT", 3.05))
+        self.read_timeout = float(os.getenv("PAGE_READ_TIMEOUT", 10))
+        self.deadline = float(os.getenv("PAGE_FETCH_DEADLINE", 20)) # Whole download
+        self.max_bytes = int(os.getenv("PAGE_MAX_BYTES", 2 * 1024 * 1024))
+        self._cache_ttl = 1800 # 30 minutes
+        # Pages can be up to max_bytes each, so bound the total size as well
+        self._cache = LRUCache(
+            max_entries=int(os.getenv("PAGE_CACHE_MAX_ENTRIES", 256)),
+            max_bytes=int(os.getenv("PAGE_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+        ) # {url: (timestamp, title, content)}
+        self._inflight = {} # {url: threading.Event}
+        self._lock = threading.Lock()
+
+    def canonical_url(self, url):
+        """Normalizes a URL so tracking variants of one article share a cache entry."""
+        parts = urllib.parse.urlsplit(url.strip())
+        query = [
+            (key, value) for key, value in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+            if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+        ]
+        return urllib.parse.urlunsplit((
+            parts.scheme.lower(),
+            parts.netloc.lower(),
+            parts.path or "/",
+            urllib.parse.urlencode(sorted(query)),
+            "" # Fragments never reach the server
+        ))
+
+    def fetch_article(self, url):
+        """Returns (title, content) for an article URL."""
+        if not url:
+            raise ValueError("Missing url")
+        key = self.canonical_url(url)
+
+        cached = self._get_cached(key)
+        if cached is not None:
+            print(f"[Page] Serving cached page for: {key}")
+            return cached
+
+        with self._lock:
+            event = self._inflight.get(key)
+            leader = event is None
+            if leader:
+                event = self._inflight[key] = threading.Event()
+
+        if not leader:
+            # Another request is already fetching this page; reuse its result
+            event.wait(self.deadline + self.connect_timeout)
+            cached = self._get_cached(key)
+            if cached is not None:
+                return cached
+            # That fetch failed, so try once more on our own
+            return self._fetch_and_cache(key)
+
+        try:
+            return self._fetch_and_cache(key)
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            event.set()
+
+    def _fetch_and_cache(self, key):
+        title, content = self._download(key)
+        self._cache.set(key, (time.time(), title, content))
+        return title, content
+
+    def _get_cached(self, key):
+        entry = self._cache.get(key)
+        if entry and time.time() - entry[0] < self._cache_ttl:
+            metrics_service.cache_result("page", "hit")
+            return entry[1], entry[2]
+        metrics_service.cache_result("page", "miss")
+        return None
+
+    def _download(self, url):
+        with metrics_service.timed("page", "download"):
+            return self._download_page(url)
+
+    def _download_page(self, url):
+        started = time.time()
+        with http_service.session.get(url, stream=True,
+                                      timeout=(self.connect_timeout, self.read_timeout)) as response:
+            response.raise_for_status()
+
+            body = bytearray()
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                body.extend(chunk)
+                if len(body) > self.max_bytes:
+                    # Keep what we have; article text is near the top of the page
+                    del body[self.max_bytes:]
+                    break
+                if time.time() - started > self.deadline:
+                    raise TimeoutError(f"Page download exceeded {self.deadline}s")
+
+            # Only trust the declared charset; otherwise let BeautifulSoup sniff it
+            content_type = response.headers.get('Content-Type', '')
+            encoding = response.encoding if 'charset' in content_type.lower() else None
+
+        # Parse only the elements we use
+        soup = BeautifulSoup(bytes(body), 'html.parser',
+                             parse_only=SoupStrainer(['title', 'p']),
+                             from_encoding=encoding)
+
+        # Extract title and likely main content
+        # str(): a NavigableString references its parent, and so the whole tree
+        title = str(soup.title.string) if soup.title and soup.title.string else "No Title"
+        # Heuristic: Find paragraphs
+        paragraphs = soup.find_all('p')
+        content = " ".join([p.get_text() for p in paragraphs])
+        return title, content
+
+page_service = PageService()
@@ -1,56 +1,126 @@
 from fpdf import FPDF
+from fpdf.fonts import SubsetMap
+from fontTools import ttLib
+from collections import defaultdict
+import copy
+import io
 import os
+import threading
+
+FONT_FAMILY = 'NanumGothic'
+FONT_KEY = 'nanumgothic' # fpdf's key for FONT_FAMILY, regular style
 
 class PDFService:
-    def create_report(self, ticker, analysis_data):
+    """
+    Renders analysis reports to PDF in memory.
+    The bundled NanumGothic font is parsed once per process; each document
+    gets a cheap copy of that parsed font instead of re-reading the 2 MB file.
+    """
+    def __init__(self):
+        # Use Bundled Font (NanumGothic) for Cross-Platform Korean support
+        self.base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.font_path = os.path.join(self.base_dir, 'static', 'fonts', 'NanumGothic.ttf')
+        self._font = None # (parsed TTFFont, glyph order, font file bytes)
+        self._lock = threading.Lock()
+
+    def _load_font(self):
+        if self._font is None:
+            with self._lock:
+                if self._font is None:
+                    if not os.path.exists(self.font_path):
+                        # Raise error immediately to show user where we looked
+                        error_msg = f"FONT FILE NOT FOUND. Checked path: {self.font_path}. Files depends on: {self.base_dir}"
+                        # Check what IS there
+                        try:
+                            static_fonts = os.path.join(self.base_dir, 'static', 'fonts')
+                            files = os.listdir(static_fonts)
+                            error_msg += f" | Existing files in {static_fonts}: {files}"
+                        except Exception as e:
+                            error_msg += f" | Could not list dir: {e}"
+                        print(error_msg)
+                        raise FileNotFoundError(error_msg)
+
+                    scratch = FPDF()
+                    scratch.add_font(FONT_FAMILY, '', self.font_path)
+                    font = scratch.fonts[FONT_KEY]
+                    with open(self.font_path, 'rb') as f:
+                        font_bytes = f.read()
+                    self._font = (font, font.ttfont.getGlyphOrder(), font_bytes)
+                    print("[PDF] Loaded NanumGothic successfully.")
+        return self._font
+
+    def _add_font(self, pdf):
+        """
+        Registers the cached font on a new document.
+        Metrics and cmap are shared read-only. Per-document state (subset,
+        widths, missing glyphs) is fresh, and so is the fontTools object,
+        because fpdf subsets it in place on output. Presetting the glyph order
+        skips the slowest part of re-reading the font. Relies on fpdf2
+        internals (pinned in requirements.txt); falls back to add_font.
+        """
+        font, glyph_order, font_bytes = self._load_font()
+        try:
+            doc_font = copy.copy(font)
+            doc_font.i = len(pdf.fonts) + 1
+            doc_font.ttfont = ttLib.TTFont(io.BytesIO(font_bytes), recalcTimestamp=False, fontNumber=0, lazy=True)
+            doc_font.ttfont.setGlyphOrder(glyph_order)
+            doc_font.cw = defaultdict(font.cw.default_factory, font.cw)
+            doc_font.subset = SubsetMap(doc_font)
+            doc_font.missing_glyphs = []
+            doc_font.biggest_size_pt = 0
+            doc_font._hbfont = None
+            pdf.fonts[FONT_KEY] = doc_font
+        except Exception as e:
+            print(f"[PDF] Font cache unavailable, loading font file: {e}")
+            pdf.add_font(FONT_FAMILY, '', self.font_path)
+
+    def render_report(self, ticker, analysis_data):
         """
         Generates a PDF report for the given ticker and analysis data.
-        Returns the file path of the generated PDF.
+        Returns an in-memory buffer (io.BytesIO) positioned at the start.
+        """
+        return self.render_sections(f"InsightPulse Report: {ticker}", [(None, analysis_data)])
+
+    def render_sections(self, title, sections):
+        """
+        Generates one PDF with a title and a list of (heading, body) sections;
+        each headed section starts on a new page. Returns an io.BytesIO.
         """
         pdf = FPDF()
         pdf.add_page()
-        
-        # Use Bundled Font (NanumGothic) for Cross-Platform Korean support
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        font_path = os.path.join(base_dir, 'static', 'fonts', 'NanumGothic.ttf')
-        
-        # Debugging: List files to check if font uploaded
-        print(f"[PDF] Current working dir: {os.getcwd()}")
-        font_dir = os.path.join(base_dir, 'static', 'fonts')
-        if os.path.exists(font_dir):
-            print(f"[PDF] Files in static/fonts: {os.listdir(font_dir)}")
-        else:
-            print(f"[PDF] static/fonts dir NOT FOUND at {font_dir}")
-
-        if os.path.exists(font_path):
-            pdf.add_font('NanumGothic', '', font_path)
-            pdf.set_font('NanumGothic', size=12)
-            print("[PDF] Loaded NanumGothic successfully.")
-        else:
-            # DEBUG: Raise error immediately to show user where we looked
-            error_msg = f"FONT FILE NOT FOUND. Checked path: {font_path}. Files depends on: {base_dir}"
-            print(error_msg)
-            # Check what IS there
-            try:
-                static_fonts = os.path.join(base_dir, 'static', 'fonts')
-                files = os.listdir(static_fonts)
-                error_msg += f" | Existing files in {static_fonts}: {files}"
-            except Exception as e:
-                error_msg += f" | Could not list dir: {e}"
-            
-            raise FileNotFoundError(error_msg)
+
+        self._add_font(pdf)
+        pdf.set_font(FONT_FAMILY, size=12)
 
         # Title
-        pdf.cell(200, 10, txt=f"InsightPulse Report: {ticker}", ln=True, align='C')
-        
-        # Body
-        pdf.set_font("NanumGothic", size=10)
-        pdf.multi_cell(0, 10, txt=str(analysis_data))
-        
-        filename = f"{ticker}_report.pdf"
-        output_path = os.path.join("services", filename) 
-        pdf.output(output_path)
-        
+        pdf.cell(200, 10, txt=title, ln=True, align='C')
+
+        for index, (heading, body) in enumerate(sections):
+            if heading:
+                if index > 0:
+                    pdf.add_page()
+                pdf.set_font(FONT_FAMILY, size=12)
+                pdf.cell(200, 10, txt=heading, ln=True)
+
+            # Body
+            pdf.set_font(FONT_FAMILY, size=10)
+            pdf.multi_cell(0, 10, txt=str(body))
+
+        return io.BytesIO(pdf.output())
+
+    def create_report(self, ticker, analysis_data, output_path=None):
+        """
+        Generates a PDF report and writes it to disk.
+        Returns the file path of the generated PDF.
+        """
+        if output_path is None:
+            filename = f"{ticker}_report.pdf"
+            output_path = os.path.join("services", filename)
+
+        buffer = self.render_report(ticker, analysis_data)
+        with open(output_path, 'wb') as f:
+            f.write(buffer.getvalue())
+
         return output_path
 
 pdf_service = PDFService()
@@ -0,0 +1,212 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from services.cache_service import DiskCache
+from services.drive_service import drive_service
+from services.gemini_service import gemini_service
+from services.job_service import job_service
+from services.scheduler_service import PRIORITY_BATCH
+from services.pdf_service import pdf_service
+from services.runtime_service import runtime_service
+
+PERSONA_LABELS = {"optimist": "낙관적 시각", "critic": "비판적 시각", "neutral": "통합 분석"}
+
+# Bump when report layout changes so old uploads are not reused
+REPORT_FORMAT_VERSION = 1
+
+# Content hash -> {'file_id', 'link'} for reports already on Drive
+report_index = DiskCache(
+    "report_index",
+    ttl=int(os.getenv("REPORT_INDEX_TTL", 30 * 86400)),
+    max_entries=int(os.getenv("REPORT_INDEX_MAX_ENTRIES", 5000))
+)
+
+class ReportService:
+    """
+    Background pipeline for PDF reports: render on one pool, upload to Drive
+    on another, and hand the Drive link back through a job. Batches fan out,
+    so total time is close to the slowest single report rather than the sum.
+    Reports are content-addressed: saving the same text again returns the
+    existing Drive link without rendering or uploading.
+    """
+    def __init__(self):
+        self._render_workers = int(os.getenv("REPORT_RENDER_WORKERS", 2))
+        self._pools = None # (render, upload)
+        self._pools_pid = None
+        self._lock = threading.Lock()
+        self.max_batch_items = int(os.getenv("REPORT_MAX_BATCH_ITEMS", 20))
+
+    def _get_pools(self):
+        # Created in the worker on first use: threads do not survive fork, and
+        # under gevent rendering must go to native threads (see runtime_service)
+        with self._lock:
+            if self._pools_pid != os.getpid():
+                self._pools = (
+                    runtime_service.cpu_executor(self._render_workers, "report-render"),
+                    ThreadPoolExecutor(max_workers=runtime_service.io_workers("REPORT_UPLOAD_WORKERS", 4),
+                                       thread_name_prefix="report-upload")
+                )
+                self._pools_pid = os.getpid()
+            return self._pools
+
+    def submit_report(self, ticker, content):
+        """Queues one report. The job result is {'link': ...}."""
+        digest = self.content_digest("report", ticker, content)
+        job, created = job_service.create(f"report|{digest}")
+        if created:
+            def done(link, error):
+                if error:
+                    job_service.finish(job, error=error)
+                else:
+                    job_service.finish(job, result={'link': link})
+
+            self._render_and_upload(digest, lambda: pdf_service.render_report(ticker, content),
+                                    f"{ticker}_report.pdf", done)
+        return job
+
+    def content_digest(self, kind, *parts):
+        """Hash identifying a rendered report by its inputs and destination folder."""
+        h = hashlib.sha256(f"{kind}|v{REPORT_FORMAT_VERSION}|{drive_service.folder_id or ''}".encode('utf-8'))
+        for part in parts:
+            h.update(b"\0" + str(part).encode('utf-8'))
+        return h.hexdigest()
+
+    def submit_batch(self, tickers, personas, combined=False):
+        """
+        Queues reports for every (ticker, persona) pair. Analyses come from
+        the analysis jobs (and cache); each report is rendered and uploaded as
+        soon as its analysis is ready. With combined=True every section goes
+        into one PDF once all analyses have arrived.
+        Job result: {'reports': [{'ticker', 'persona', 'link', 'error'}, ...]}
+        or, when combined, {'link': ..., 'errors': [{'ticker', 'persona', 'error'}, ...]}.
+        Failed analyses are never rendered: they get an error entry, and a
+        combined report leaves their section out (or fails if none are left).
+        """
+        items = [(ticker, persona) for ticker in tickers for persona in personas]
+        key = "batch|" + ("combined|" if combined else "") + ",".join(f"{t}:{p}" for t, p in items)
+        job, created = job_service.create(key)
+        if not created:
+            return job
+
+        lock = threading.Lock()
+        remaining = [len(items)]
+        results = [None] * len(items)
+
+        def item_done(index, value):
+            # Returns True for the last item to complete
+            with lock:
+                results[index] = value
+                remaining[0] -= 1
+                return remaining[0] == 0
+
+        errors = []
+
+        def finish_batch(link, error):
+            if error:
+                job_service.finish(job, error=error)
+            else:
+                job_service.finish(job, result={'link': link, 'errors': errors})
+
+        def on_analysis(index, ticker, persona, analysis_job):
+            # analyze_stock reports most failures as returned text, not as a job error
+            if analysis_job.status == 'done' and not gemini_service.is_error(analysis_job.result):
+                text, error = analysis_job.result, None
+            else:
+                text, error = None, analysis_job.error or analysis_job.result or "Empty analysis"
+
+            if combined:
+                if error:
+                    with lock:
+                        errors.append({'ticker': ticker, 'persona': persona, 'error': error})
+                section = None if error else (f"{ticker} · {PERSONA_LABELS.get(persona, persona)}", text)
+                if item_done(index, section):
+                    sections = [section for section in results if section]
+                    if not sections:
+                        finish_batch(None, f"No analysis could be generated: {errors[0]['error']}")
+                        return
+                    title = f"InsightPulse Report: {tickers[0]}" if len(tickers) == 1 else "InsightPulse Report"
+                    file_name = f"{tickers[0]}_combined_report.pdf" if len(tickers) == 1 else "InsightPulse_batch_report.pdf"
+                    digest = self.content_digest("sections", title, *(p for section in sections for p in section))
+                    self._render_and_upload(digest, lambda: pdf_service.render_sections(title, sections),
+                                            file_name, finish_batch)
+                return
+
+            def uploaded(link, error):
+                entry = {'ticker': ticker, 'persona': persona, 'link': link, 'error': error}
+                if item_done(index, entry):
+                    job_service.finish(job, result={'reports': results})
+
+            if error:
+                uploaded(None, error)
+                return
+
+            report_title = f"{ticker} ({PERSONA_LABELS.get(persona, persona)})"
+            self._render_and_upload(
+                self.content_digest("report", report_title, text),
+                lambda: pdf_service.render_report(report_title, text),
+                f"{ticker}_{persona}_report.pdf", uploaded)
+
+        for index, (ticker, persona) in enumerate(items):
+            key = gemini_service.analysis_key(ticker, persona)
+            cached = gemini_service.cached_analysis(ticker, persona)
+            if cached is not None:
+                analysis_job = job_service.completed(key, cached)
+            else:
+                analysis_job = job_service.submit(key, gemini_service.analyze_stock, ticker, persona,
+                                                  priority=PRIORITY_BATCH)
+            analysis_job.add_done_callback(
+                lambda analysis_job, index=index, ticker=ticker, persona=persona:
+                    on_analysis(index, ticker, persona, analysis_job)
+            )
+        return job
+
+    def _render_and_upload(self, digest, render, file_name, on_done):
+        """
+        Runs render() on the render pool, uploads the buffer, then calls
+        on_done(link, error). If a report with this digest is already on
+        Drive, calls on_done with its link straight away.
+        """
+        indexed = report_index.get(digest)
+        if indexed:
+            print(f"[Report] Reusing uploaded report for {file_name}: {indexed['file_id']}")
+            on_done(indexed['link'], None)
+            return
+
+        def uploaded(future):
+            try:
+                file, error = future.result()
+            except Exception as e:
+                file, error = None, str(e)
+            if error:
+                on_done(None, error)
+                return
+            report_index.set(digest, {'file_id': file.get('id'), 'link': file.get('webViewLink')})
+            on_done(file.get('webViewLink'), None)
+
+        def rendered(future):
+            try:
+                buffer = future.result()
+            except Exception as e:
+                print(f"[Report] Render failed for {file_name}: {e}")
+                on_done(None, str(e))
+                return
+            try:
+                upload = upload_pool.submit(drive_service.create_file, buffer, file_name)
+            except Exception as e: # e.g. the pool is shut down
+                print(f"[Report] Could not queue upload of {file_name}: {e}")
+                on_done(None, str(e))
+                return
+            upload.add_done_callback(uploaded)
+
+        render_pool, upload_pool = self._get_pools()
+        try:
+            rendering = render_pool.submit(render)
+        except Exception as e:
+            print(f"[Report] Could not queue render of {file_name}: {e}")
+            on_done(None, str(e))
+            return
+        rendering.add_done_callback(runtime_service.done_callback(rendered))
+
+report_service = ReportService()
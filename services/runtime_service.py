@@ -0,0 +1,54 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+class RuntimeService:
+    """
+    Tells services whether this worker runs under gevent (gunicorn's gevent
+    worker class), where sockets are cooperative: a request waiting on
+    feeds, pages, Gemini or Drive yields to the others, so one worker serves
+    many concurrent waits. Network-bound code needs no changes for that;
+    CPU-bound work has to run on native threads so it does not stall the
+    whole worker, and gRPC has to be avoided.
+    """
+    def __init__(self):
+        self.cooperative_io_workers = int(os.getenv("GEVENT_IO_WORKERS", 100))
+
+    @property
+    def cooperative(self):
+        try:
+            from gevent import monkey
+        except ImportError:
+            return False
+        return monkey.is_module_patched("socket")
+
+    def io_workers(self, env_var, default):
+        """
+        Size of a pool for network-bound work: env_var if set, otherwise
+        default, raised to cooperative_io_workers under gevent where each
+        worker is a cheap greenlet.
+        """
+        value = os.getenv(env_var)
+        if value:
+            return int(value)
+        if self.cooperative:
+            return max(default, self.cooperative_io_workers)
+        return default
+
+    def cpu_executor(self, max_workers, thread_name_prefix):
+        """Executor backed by native OS threads, even when threading is monkey-patched."""
+        if self.cooperative:
+            from gevent.threadpool import ThreadPoolExecutor as NativeThreadPoolExecutor
+            return NativeThreadPoolExecutor(max_workers)
+        return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+
+    def done_callback(self, fn):
+        """
+        Wraps a callback for a cpu_executor future. gevent runs those in the
+        event loop, where blocking is not allowed, so hand them to a greenlet.
+        """
+        if not self.cooperative:
+            return fn
+        import gevent
+        return lambda future: gevent.spawn(fn, future)
+
+runtime_service = RuntimeService()
@@ -0,0 +1,224 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from google.api_core import exceptions as google_exceptions
+
+# Lower value runs first
+PRIORITY_INTERACTIVE = 0 # A user is waiting on the response
+PRIORITY_BATCH = 1 # Batch exports, background refreshes
+
+# Errors that say something about the model endpoint itself
+BREAKER_ERRORS = (google_exceptions.GoogleAPICallError, google_exceptions.RetryError,
+                  ConnectionError, TimeoutError)
+# Quota exhaustion trips the breaker immediately
+QUOTA_ERRORS = (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)
+
+class ModelUnavailable(RuntimeError):
+    """The model's circuit is open; callers should use a fallback."""
+
+class RateLimited(RuntimeError):
+    """No request slot for the model was free within the wait limit."""
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures (or one
+    quota error). While open, calls are refused. After `cooldown` seconds one
+    probe call is let through: success closes the circuit, failure reopens
+    it with the cooldown doubled (up to `max_cooldown`).
+    """
+    def __init__(self, failure_threshold, cooldown, max_cooldown):
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.state = "closed" # closed | open | half_open
+        self.failures = 0
+        self.cooldown = cooldown
+        self.opened_at = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                print("[Scheduler] Circuit closed.")
+            self.state = "closed"
+            self.failures = 0
+            self.cooldown = self.base_cooldown
+            self._probing = False
+
+    def record_failure(self, trip=False):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open":
+                self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+            elif not trip and self.failures < self.failure_threshold:
+                return
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self._probing = False
+            print(f"[Scheduler] Circuit open for {self.cooldown:.0f}s.")
+
+    def cancel_probe(self):
+        # The probe ended without telling us anything (cancelled, rate limited)
+        with self._lock:
+            self._probing = False
+
+class ModelGate:
+    """
+    Token bucket (requests per minute with a burst allowance) plus a cap on
+    concurrent calls. Waiters are served by priority, then arrival order.
+    """
+    def __init__(self, rpm, burst, max_concurrent, breaker=None):
+        self.rate = rpm / 60.0 # Tokens per second; 0 disables rate limiting
+        self.capacity = max(1, burst)
+        self.max_concurrent = max(1, max_concurrent)
+        self.breaker = breaker
+        self.tokens = float(self.capacity)
+        self.in_flight = 0
+        self._updated = time.monotonic()
+        self._waiters = [] # heap of (priority, seq)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, priority, timeout=None):
+        """Waits for a slot. Returns False if none was free within timeout seconds."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        ticket = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    if self.rate:
+                        self._refill()
+                    has_token = not self.rate or self.tokens >= 1
+                    if self._waiters[0] == ticket and has_token and self.in_flight < self.max_concurrent:
+                        if self.rate:
+                            self.tokens -= 1
+                        self.in_flight += 1
+                        return True
+
+                    # Sleep until the next token is due (releases notify us sooner)
+                    wait = None if has_token else (1 - self.tokens) / self.rate
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            return False
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self._cond.wait(wait)
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+class SchedulerService:
+    """
+    Central gate for Gemini calls: per-model rate limits and concurrency,
+    priority ordering, and a circuit breaker on the research model so
+    callers skip straight to Flash while it is failing. Limits apply per
+    process; divide them by the worker count when running several workers.
+    """
+    def __init__(self):
+        self.queue_timeout = float(os.getenv("GEMINI_QUEUE_TIMEOUT", 60))
+        self._gates = {}
+        self._lock = threading.Lock()
+
+    def configure(self, model_name, prefix, rpm, burst, max_concurrent, breaker=False):
+        """Registers limits for a model; `prefix` names its env overrides (e.g. GEMINI_FLASH)."""
+        circuit = None
+        if breaker:
+            circuit = CircuitBreaker(
+                failure_threshold=int(os.getenv(f"{prefix}_BREAKER_FAILURES", 3)),
+                cooldown=float(os.getenv(f"{prefix}_BREAKER_COOLDOWN", 300)),
+                max_cooldown=float(os.getenv(f"{prefix}_BREAKER_MAX_COOLDOWN", 3600))
+            )
+        with self._lock:
+            self._gates[model_name] = ModelGate(
+                rpm=float(os.getenv(f"{prefix}_RPM", rpm)),
+                burst=int(os.getenv(f"{prefix}_BURST", burst)),
+                max_concurrent=int(os.getenv(f"{prefix}_CONCURRENCY", max_concurrent)),
+                breaker=circuit
+            )
+
+    def _gate(self, model_name):
+        with self._lock:
+            gate = self._gates.get(model_name)
+            if gate is None:
+                # Unconfigured models are only capped on concurrency
+                gate = self._gates[model_name] = ModelGate(rpm=0, burst=1, max_concurrent=8)
+            return gate
+
+    @contextmanager
+    def slot(self, model_name, priority=PRIORITY_INTERACTIVE, timeout=None):
+        """
+        Holds a request slot for model_name around one call (or one stream).
+        Raises ModelUnavailable if the circuit is open and RateLimited if no
+        slot frees up within timeout (default GEMINI_QUEUE_TIMEOUT).
+        Endpoint errors raised inside the block count against the breaker.
+        """
+        gate = self._gate(model_name)
+        breaker = gate.breaker
+        if breaker and not breaker.allow():
+            raise ModelUnavailable(f"{model_name} is unavailable (circuit open)")
+
+        if not gate.acquire(priority, self.queue_timeout if timeout is None else timeout):
+            if breaker:
+                breaker.cancel_probe()
+            raise RateLimited(f"No {model_name} request slot available")
+
+        try:
+            yield
+        except BREAKER_ERRORS as e:
+            if breaker:
+                breaker.record_failure(trip=isinstance(e, QUOTA_ERRORS))
+            raise
+        except BaseException:
+            # Cancelled stream or a local error: no verdict on the endpoint
+            if breaker:
+                breaker.cancel_probe()
+            raise
+        else:
+            if breaker:
+                breaker.record_success()
+        finally:
+            gate.release()
+
+    def status(self):
+        """Per-model limiter and circuit state, for diagnostics."""
+        with self._lock:
+            gates = dict(self._gates)
+        return {
+            name: {
+                "in_flight": gate.in_flight,
+                "waiting": len(gate._waiters),
+                "tokens": round(gate.tokens, 2) if gate.rate else None,
+                "circuit": gate.breaker.state if gate.breaker else None
+            }
+            for name, gate in gates.items()
+        }
+
+scheduler_service = SchedulerService()
@@ -0,0 +1,66 @@
+import os
+
+from services.cache_service import LRUCache
+from services.gemini_service import gemini_service
+from services.news_archive_service import news_archive_service
+
+POSITIVE_TERMS = [
+    "상승", "급등", "강세", "반등", "호재", "호황", "흑자", "최대", "신고가", "돌파",
+    "성장", "수주", "수혜", "개선", "확대", "증가", "상향", "매수", "기대", "회복"
+]
+NEGATIVE_TERMS = [
+    "하락", "급락", "약세", "폭락", "악재", "불황", "적자", "손실", "부진", "둔화",
+    "감소", "축소", "하향", "매도", "우려", "위기", "리스크", "규제", "소송", "제재"
+]
+
+class SentimentService:
+    """
+    Scores headline sentiment and market impact for news items.
+    All unscored headlines of a refresh go to Gemini in a single batched call;
+    without an API key (or if the call fails) a local lexicon scorer is used.
+    Scores are memoized per article link, in this process and in the news
+    archive, so an item is never scored twice.
+    """
+    def __init__(self):
+        self._memo = LRUCache(max_entries=int(os.getenv("SENTIMENT_MEMO_MAX_ENTRIES", 5000)))
+
+    def score(self, items, remote=True):
+        """
+        Adds 'sentiment' and 'impact' to each item in place.
+        With remote=False nothing new is sent to Gemini: unscored headlines get
+        the lexicon score without memoizing it, so a later refresh still can.
+        """
+        pending = [item for item in items if self._memo.get(item["link"]) is None]
+        if pending:
+            archived = news_archive_service.scores([item["link"] for item in pending])
+            for link, score in archived.items():
+                self._memo.set(link, score)
+            pending = [item for item in pending if item["link"] not in archived]
+        if pending and remote:
+            titles = [item["title"] for item in pending]
+            scores = gemini_service.score_headlines(titles)
+            if scores is None:
+                scores = [self._lexicon_score(title) for title in titles]
+            for item, score in zip(pending, scores):
+                self._memo.set(item["link"], score)
+            news_archive_service.set_scores({item["link"]: score for item, score in zip(pending, scores)})
+            print(f"[Sentiment] Scored {len(pending)} new headlines")
+
+        for item in items:
+            item.update(self._memo.get(item["link"]) or self._lexicon_score(item["title"]))
+        return items
+
+    def _lexicon_score(self, title):
+        positives = [term for term in POSITIVE_TERMS if term in title]
+        negatives = [term for term in NEGATIVE_TERMS if term in title]
+
+        if len(positives) > len(negatives):
+            return {"sentiment": "positive",
+                    "impact": f"긍정적 신호({', '.join(positives)})가 담긴 기사입니다."}
+        if len(negatives) > len(positives):
+            return {"sentiment": "negative",
+                    "impact": f"부정적 신호({', '.join(negatives)})가 담긴 기사입니다."}
+        return {"sentiment": "neutral",
+                "impact": "헤드라인에서 뚜렷한 시장 방향성이 드러나지 않는 기사입니다."}
+
+sentiment_service = SentimentService()
@@ -0,0 +1,43 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+class StartupService:
+    """
+    Records how long each service takes to import and to initialize, so slow
+    boots and worker (re)spawns can be traced to a specific dependency.
+    """
+    def __init__(self):
+        self._started = time.perf_counter()
+        self._timings = [] # [(pid, service, phase, seconds)]
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def timed(self, service, phase):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._timings.append((os.getpid(), service, phase, elapsed))
+
+    def timings(self):
+        """
+        Timings as JSON-friendly dicts. A forked worker also sees what its
+        parent recorded before the fork (e.g. imports under --preload).
+        """
+        with self._lock:
+            return [
+                {"pid": pid, "service": service, "phase": phase, "ms": round(seconds * 1000, 1)}
+                for pid, service, phase, seconds in self._timings
+            ]
+
+    def report(self):
+        lines = [f"[Startup] pid {os.getpid()}, {(time.perf_counter() - self._started) * 1000:.0f} ms since boot"]
+        for timing in self.timings():
+            lines.append(f"[Startup]   {timing['service']:<10} {timing['phase']:<7} {timing['ms']:>9.1f} ms")
+        return "\n".join(lines)
+
+startup_service = StartupService()
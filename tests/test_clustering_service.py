@@ -0,0 +1,49 @@
+from services.clustering_service import ClusteringService
+
+def _item(link, title):
+    return {"link": link, "title": title}
+
+def test_reclustering_keeps_alternates():
+    service = ClusteringService()
+    feed = service.cluster([
+        _item("1", "삼성전자, HBM4 양산 앞당긴다…엔비디아 공급 협상 막바지 - 한국경제"),
+        _item("2", "[단독] 삼성전자 HBM4 양산 앞당긴다, 엔비디아 공급협상 막바지 - 매일경제"),
+    ])
+    assert [alternate["link"] for alternate in feed[0]["alternates"]] == ["2"]
+
+    merged = service.cluster(feed + [_item("3", "코스피, 외국인 순매수에 2,700선 회복 - 연합뉴스")])
+    assert [item["link"] for item in merged] == ["1", "3"]
+    assert [alternate["link"] for alternate in merged[0]["alternates"]] == ["2"]
+    assert merged[1]["alternates"] == []
+
+def test_reclustering_folds_groups_without_duplicates():
+    service = ClusteringService()
+    first = service.cluster([
+        _item("1", "삼성전자, HBM4 양산 앞당긴다…엔비디아 공급 협상 막바지 - 한국경제"),
+        _item("2", "[단독] 삼성전자 HBM4 양산 앞당긴다, 엔비디아 공급협상 막바지 - 매일경제"),
+    ])
+    second = service.cluster([
+        _item("3", "삼성전자, HBM4 양산 시기 앞당긴다…엔비디아와 공급 협상 막바지 - 연합뉴스"),
+        _item("2", "[단독] 삼성전자 HBM4 양산 앞당긴다, 엔비디아 공급협상 막바지 - 매일경제"),
+    ])
+    merged = service.cluster(first + second)
+    assert len(merged) == 1
+    assert sorted(alternate["link"] for alternate in merged[0]["alternates"]) == ["2", "3"]
+
+def test_output_follows_input_order_when_a_title_bridges_groups():
+    service = ClusteringService()
+    service.threshold = 0.4
+    left = "가나다라마바사아자차카"
+    right = "타파하거너더러머버서어"
+    items = [
+        _item("left", left),
+        _item("other", "코스피 외국인 순매수 회복"),
+        _item("right", right),
+        _item("bridge", left + right),
+    ]
+    # Either of the two "left"/"right" groups may end up as the union-find root
+    for order in (items, [items[2], items[1], items[0], items[3]]):
+        result = service.cluster(order)
+        assert [item["link"] for item in result] == [order[0]["link"], "other"]
+        assert sorted(alternate["link"] for alternate in result[0]["alternates"]) == sorted(
+            item["link"] for item in order if item["link"] not in (order[0]["link"], "other"))
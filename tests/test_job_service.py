@@ -0,0 +1,47 @@
+from services import job_service as job_module
+from services.job_service import ABANDONED, JobService
+
+def _workers(tmp_path, monkeypatch):
+    # Two services over one store stand in for two gunicorn workers
+    monkeypatch.setenv("JOB_STORE_PATH", str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setenv("JOB_POLL_INTERVAL", "0.01")
+    return JobService(), JobService()
+
+def test_finished_job_is_visible_from_another_worker(tmp_path, monkeypatch):
+    first, second = _workers(tmp_path, monkeypatch)
+    job = first.completed("AAPL|critic", "analysis")
+
+    polled = second.get(job.id)
+    assert polled.status == "done"
+    assert polled.result == "analysis"
+    assert second.get("unknown") is None
+
+def test_submission_attaches_to_job_running_in_another_worker(tmp_path, monkeypatch):
+    first, second = _workers(tmp_path, monkeypatch)
+    job, created = first.create("AAPL|critic")
+    assert created
+
+    attached, created = second.create("AAPL|critic")
+    assert not created
+    assert attached.id == job.id
+    finished = []
+    attached.add_done_callback(lambda attached: finished.append(attached.result))
+
+    first.finish(job, result={"link": "https://example.com/report"})
+    second.wait(attached, timeout=5)
+    assert attached.status == "done"
+    assert finished == [{"link": "https://example.com/report"}]
+
+def test_job_left_by_an_earlier_run_is_not_joined(tmp_path, monkeypatch):
+    first, second = _workers(tmp_path, monkeypatch)
+    run_id = job_module.RUN_ID
+    monkeypatch.setattr(job_module, "RUN_ID", "earlier-run")
+    stale, _ = first.create("AAPL|critic")
+    monkeypatch.setattr(job_module, "RUN_ID", run_id)
+
+    job, created = second.create("AAPL|critic")
+    assert created
+    assert job.id != stale.id
+    abandoned = JobService().get(stale.id)
+    assert abandoned.status == "error"
+    assert abandoned.error == ABANDONED